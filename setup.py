@@ -10,7 +10,7 @@ setup(
     python_requires=">=3.10",
     install_requires=[
         "mcp>=1.2.0",
-        "anthropic>=0.8.0",
+        "anthropic>=0.52.0",
         "openai>=1.0.0",
         "python-dotenv>=1.0.0",
         "Pillow>=10.0.0",
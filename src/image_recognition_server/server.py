@@ -1,17 +1,24 @@
+import asyncio
 import base64
-import io
+import json
 import logging
 import os
-from typing import Union
+from pathlib import Path
+from typing import Optional, Union
 
 from dotenv import load_dotenv
 from mcp.server.fastmcp import FastMCP
-from PIL import Image
 
 from .utils.image import image_to_base64, validate_base64_image
-from .utils.ocr import OCRError, extract_text_from_image
+from .utils.index import ImageIndex
+from .utils.ocr import OCRError, extract_ocr_data_cached, extract_text_cached
+from .utils.profiling import Trace, span, trace_request
+from .utils.store import ImageStore
 from .vision.anthropic import AnthropicVision
+from .vision.errors import FileReferenceError
 from .vision.openai import OpenAIVision
+from .vision.routing import (call_vision_client, describe_with_routing,
+                             routing_enabled)
 
 # Load environment variables
 load_dotenv()
@@ -77,39 +84,145 @@ def get_vision_client() -> Union[AnthropicVision, OpenAIVision]:
         raise
 
 
-async def process_image_with_ocr(image_data: str, prompt: str) -> str:
-    """Process image with both vision AI and OCR.
+_image_store: Optional[ImageStore] = None
+
+
+def get_image_store() -> ImageStore:
+    """Get the store for registered images, creating it on first use."""
+    global _image_store
+    if _image_store is None:
+        root = os.getenv("IMAGE_STORE_PATH") or os.path.join(
+            os.path.dirname(__file__), "image_store"
+        )
+        logger.info(f"Using image store: {root}")
+        _image_store = ImageStore(root)
+    return _image_store
+
+
+async def get_provider_file_id(
+    client: Union[AnthropicVision, OpenAIVision], image_id: str
+) -> Optional[str]:
+    """Get the provider file ID for a registered image, uploading it once.
+
+    Returns None if provider file uploads are disabled, the provider doesn't
+    support them, or the upload fails.
+    """
+    if os.getenv("PROVIDER_FILE_UPLOADS", "false").lower() != "true":
+        return None
+    if not hasattr(client, "upload_image"):
+        return None
+
+    store = get_image_store()
+    if file_id := store.get_file_id(image_id, client.provider):
+        return file_id
+
+    try:
+        with span("upload", provider=client.provider):
+            file_id = await asyncio.to_thread(
+                client.upload_image,
+                store.get(image_id),
+                store.get_meta(image_id)["mime_type"],
+                image_id,
+            )
+    except Exception as e:
+        logger.warning(f"Upload of {image_id} failed, sending inline: {str(e)}")
+        return None
+
+    store.set_file_id(image_id, client.provider, file_id)
+    return file_id
+
+
+async def describe_with_vision(
+    image_data: str, prompt: str, image_id: Optional[str] = None
+) -> str:
+    """Describe an image with the configured vision provider.
 
     Args:
         image_data: Base64 encoded image data
         prompt: Prompt for vision AI
+        image_id: Optional registered image ID, used for its stored MIME type
+            and to reference a file uploaded to the provider instead of
+            sending image_data
 
     Returns:
-        str: Combined description from vision AI and OCR
+        str: Description from vision AI
+
+    Raises:
+        ValueError: If the vision API returns an empty or default response
     """
-    # Get vision AI description
     client = get_vision_client()
+    file_id = None
+    mime_type = None
+    if image_id:
+        mime_type = get_image_store().get_meta(image_id)["mime_type"]
+        file_id = await get_provider_file_id(client, image_id)
 
-    # Handle both sync (Anthropic) and async (OpenAI) clients
-    if isinstance(client, OpenAIVision):
-        description = await client.describe_image(image_data, prompt)
-    else:
-        description = client.describe_image(image_data, prompt)
+    with span("vision", routing=routing_enabled()):
+        try:
+            description = await _describe(
+                client, image_data, prompt, file_id, mime_type
+            )
+        except FileReferenceError as e:
+            if not image_id:
+                raise
+            # The uploaded file expired or was deleted, upload it again next time
+            logger.warning(f"File reference {file_id} failed, retrying inline: {e}")
+            get_image_store().set_file_id(image_id, client.provider, None)
+            description = await _describe(client, image_data, prompt, None, mime_type)
 
     # Check for empty or default response
     if not description or description == "No description available.":
         raise ValueError("Vision API returned empty or default response")
 
+    return description
+
+
+async def _describe(
+    client: Union[AnthropicVision, OpenAIVision],
+    image_data: str,
+    prompt: str,
+    file_id: Optional[str],
+    mime_type: Optional[str],
+) -> str:
+    # Try the provider's small model first when routing is enabled
+    if routing_enabled():
+        return await describe_with_routing(
+            client, image_data, prompt, file_id, mime_type
+        )
+    return await call_vision_client(
+        client, image_data, prompt, file_id=file_id, mime_type=mime_type
+    )
+
+
+async def process_image_with_ocr(
+    image_data: str, prompt: str, image_id: Optional[str] = None
+) -> str:
+    """Process image with both vision AI and OCR.
+
+    Args:
+        image_data: Base64 encoded image data
+        prompt: Prompt for vision AI
+        image_id: Optional registered image ID, see describe_with_vision
+
+    Returns:
+        str: Combined description from vision AI and OCR
+    """
+    # Get vision AI description
+    description = await describe_with_vision(image_data, prompt, image_id)
+
     # Handle OCR if enabled
     ocr_enabled = os.getenv("ENABLE_OCR", "false").lower() == "true"
     if ocr_enabled:
         try:
-            # Convert base64 to PIL Image
-            image_bytes = base64.b64decode(image_data)
-            image = Image.open(io.BytesIO(image_bytes))
+            # Results are cached by image content, so repeated images and
+            # different prompts on the same image don't re-run Tesseract
+            with span("decode"):
+                image_bytes = base64.b64decode(image_data)
 
             # Extract text with OCR required flag
-            if ocr_text := extract_text_from_image(image, ocr_required=True):
+            if ocr_text := await asyncio.to_thread(
+                extract_text_cached, image_bytes, ocr_required=True
+            ):
                 description += (
                     f"\n\nAdditionally, this is the output of tesseract-ocr: {ocr_text}"
                 )
@@ -124,33 +237,96 @@ async def process_image_with_ocr(image_data: str, prompt: str) -> str:
     return sanitize_output(description)
 
 
+def with_timings(result: str, trace: Optional[Trace]) -> str:
+    """Wrap a tool result in JSON together with the request's stage timings."""
+    timings = trace.timings() if trace is not None else {}
+    return json.dumps({"description": result, "timings": timings})
+
+
+@mcp.tool()
+async def register_image(
+    image: Optional[str] = None, filepath: Optional[str] = None
+) -> str:
+    """Register an image once and get a short ID to use with describe_image.
+
+    Registered images are stored by content on local disk, so repeated
+    questions about the same image don't resend its data.
+
+    Args:
+        image: Base64 encoded image data
+        filepath: Path to an image file, as an alternative to image
+
+    Returns:
+        str: Image ID, e.g. "img_0123456789abcdef"
+    """
+    try:
+        if filepath:
+            logger.info(f"Registering image file: {filepath}")
+            path = Path(filepath)
+            if not path.exists():
+                raise FileNotFoundError(f"Image file not found: {filepath}")
+            data = path.read_bytes()
+        elif image:
+            data = base64.b64decode(image)
+        else:
+            raise ValueError("Either image or filepath is required")
+
+        return get_image_store().put(data)
+    except FileNotFoundError:
+        logger.error(f"Image file not found: {filepath}")
+        raise
+    except ValueError as e:
+        logger.error(f"Input error: {str(e)}")
+        raise
+    except Exception as e:
+        logger.error(f"Error registering image: {str(e)}", exc_info=True)
+        raise
+
+
 @mcp.tool()
 async def describe_image(
-    image: str, prompt: str = "Please describe this image in detail."
+    image: str = "",
+    prompt: str = "Please describe this image in detail.",
+    include_timings: bool = False,
+    image_id: Optional[str] = None,
 ) -> str:
     """Describe the contents of an image using vision AI.
 
     Args:
         image: Image data and MIME type
         prompt: Optional prompt to use for the description.
+        include_timings: Return JSON with "description" and per-stage
+            "timings" in milliseconds instead of plain text.
+        image_id: ID from register_image, to use instead of image.
 
     Returns:
         str: Detailed description of the image
     """
     try:
         logger.info(f"Processing image description request with prompt: {prompt}")
-        logger.debug(f"Image data length: {len(image)}")
-
-        # Validate image data
-        if not validate_base64_image(image):
-            raise ValueError("Invalid base64 image data")
 
-        result = await process_image_with_ocr(image, prompt)
-        if not result:
-            raise ValueError("Received empty response from processing")
+        with trace_request("describe_image", force=include_timings) as trace:
+            if image_id:
+                with span("load", image_id=image_id):
+                    image = base64.b64encode(get_image_store().get(image_id)).decode(
+                        "utf-8"
+                    )
+            elif not image:
+                raise ValueError("Either image or image_id is required")
+            logger.debug(f"Image data length: {len(image)}")
+
+            # Validate image data
+            with span("validate"):
+                if not validate_base64_image(image):
+                    raise ValueError("Invalid base64 image data")
+
+            result = await process_image_with_ocr(image, prompt, image_id)
+            if not result:
+                raise ValueError("Received empty response from processing")
 
         logger.info("Successfully processed image")
-        return sanitize_output(result)
+        result = sanitize_output(result)
+        return with_timings(result, trace) if include_timings else result
     except ValueError as e:
         logger.error(f"Input error: {str(e)}")
         raise
@@ -161,13 +337,17 @@ async def describe_image(
 
 @mcp.tool()
 async def describe_image_from_file(
-    filepath: str, prompt: str = "Please describe this image in detail."
+    filepath: str,
+    prompt: str = "Please describe this image in detail.",
+    include_timings: bool = False,
 ) -> str:
     """Describe the contents of an image file using vision AI.
 
     Args:
         filepath: Path to the image file
         prompt: Optional prompt to use for the description.
+        include_timings: Return JSON with "description" and per-stage
+            "timings" in milliseconds instead of plain text.
 
     Returns:
         str: Detailed description of the image
@@ -175,18 +355,23 @@ async def describe_image_from_file(
     try:
         logger.info(f"Processing image file: {filepath}")
 
-        # Convert image to base64
-        image_data, mime_type = image_to_base64(filepath)
-        logger.info(f"Successfully converted image to base64. MIME type: {mime_type}")
-        logger.debug(f"Base64 data length: {len(image_data)}")
+        with trace_request("describe_image_from_file", force=include_timings) as trace:
+            # Convert image to base64
+            with span("read_file"):
+                image_data, mime_type = image_to_base64(filepath)
+            logger.info(
+                f"Successfully converted image to base64. MIME type: {mime_type}"
+            )
+            logger.debug(f"Base64 data length: {len(image_data)}")
 
-        # Use describe_image tool
-        result = await describe_image(image=image_data, prompt=prompt)
+            # Use describe_image tool
+            result = await describe_image(image=image_data, prompt=prompt)
 
-        if not result:
-            raise ValueError("Received empty response from processing")
+            if not result:
+                raise ValueError("Received empty response from processing")
 
-        return sanitize_output(result)
+        result = sanitize_output(result)
+        return with_timings(result, trace) if include_timings else result
     except FileNotFoundError:
         logger.error(f"Image file not found: {filepath}")
         raise
@@ -198,5 +383,145 @@ async def describe_image_from_file(
         raise
 
 
+@mcp.tool()
+async def extract_text(
+    image: str,
+    lang: Optional[str] = None,
+    psm: Optional[int] = None,
+    min_confidence: float = 0.0,
+) -> str:
+    """Extract text with word and line bounding boxes using Tesseract OCR.
+
+    Args:
+        image: Base64 encoded image data
+        lang: Optional Tesseract language(s), e.g. "eng" or "eng+deu"
+        psm: Optional Tesseract page segmentation mode (0-13)
+        min_confidence: Drop words with a confidence (0-100) below this value
+
+    Returns:
+        str: JSON object with "text", "words" and "lines" keys. Each word and
+            line has "text", "confidence", "left", "top", "width" and "height".
+    """
+    try:
+        logger.info(f"Processing OCR request with lang={lang}, psm={psm}")
+
+        with trace_request("extract_text"):
+            # Validate image data
+            with span("validate"):
+                if not validate_base64_image(image):
+                    raise ValueError("Invalid base64 image data")
+
+            # Tesseract is blocking, keep it off the event loop
+            result = await asyncio.to_thread(
+                extract_ocr_data_cached,
+                base64.b64decode(image),
+                ocr_required=True,
+                lang=lang,
+                psm=psm,
+                min_confidence=min_confidence,
+            )
+        if result is None:
+            result = {"text": "", "words": [], "lines": []}
+
+        return sanitize_output(json.dumps(result))
+    except OCRError as e:
+        logger.error(f"OCR processing failed: {str(e)}")
+        raise ValueError(f"OCR Error: {str(e)}")
+    except ValueError as e:
+        logger.error(f"Input error: {str(e)}")
+        raise
+    except Exception as e:
+        logger.error(f"Error extracting text: {str(e)}", exc_info=True)
+        raise
+
+
+_image_index: Optional[ImageIndex] = None
+
+
+def get_image_index() -> ImageIndex:
+    """Get the local image index, opening it on first use."""
+    global _image_index
+    if _image_index is None:
+        db_path = os.getenv("IMAGE_INDEX_PATH") or os.path.join(
+            os.path.dirname(__file__), "image_index.db"
+        )
+        logger.info(f"Opening image index: {db_path}")
+        _image_index = ImageIndex(db_path)
+    return _image_index
+
+
+def _index_workers_from_env(default: int = 4) -> int:
+    """Read INDEX_WORKERS, falling back to the default on invalid values."""
+    value = os.getenv("INDEX_WORKERS")
+    try:
+        return int(value) if value else default
+    except ValueError:
+        logger.warning(f"Invalid value for INDEX_WORKERS: {value}, using {default}")
+        return default
+
+
+@mcp.tool()
+async def index_directory(
+    directory: str,
+    prompt: str = "Please describe this image in detail.",
+    recursive: bool = True,
+) -> str:
+    """Index the images in a directory for fast text search.
+
+    Only new or changed files are sent to the vision API, so re-running this
+    on the same directory is cheap.
+
+    Args:
+        directory: Path to the directory to index
+        prompt: Optional prompt to use for the descriptions.
+        recursive: Whether to include subdirectories.
+
+    Returns:
+        str: JSON object with counts of indexed, reused, unchanged, removed
+            and failed files
+    """
+    try:
+        logger.info(f"Indexing directory: {directory}")
+        stats = await get_image_index().refresh(
+            directory,
+            describe_with_vision,
+            prompt=prompt,
+            recursive=recursive,
+            max_workers=_index_workers_from_env(),
+            use_ocr=os.getenv("ENABLE_OCR", "false").lower() == "true",
+        )
+        return json.dumps(stats)
+    except FileNotFoundError:
+        logger.error(f"Directory not found: {directory}")
+        raise
+    except Exception as e:
+        logger.error(f"Error indexing directory: {str(e)}", exc_info=True)
+        raise
+
+
+@mcp.tool()
+async def search_images(
+    query: str, limit: int = 10, directory: Optional[str] = None
+) -> str:
+    """Search indexed images by description and OCR text, without API calls.
+
+    Args:
+        query: Search terms, e.g. "invoice total"
+        limit: Maximum number of results.
+        directory: Optional directory to restrict results to.
+
+    Returns:
+        str: JSON list of matches with "path", "snippet", "description" and
+            "ocr_text", most relevant first
+    """
+    try:
+        logger.info(f"Searching image index for: {query}")
+        results = get_image_index().search(query, limit=limit, directory=directory)
+        return sanitize_output(json.dumps(results))
+    except Exception as e:
+        logger.error(f"Error searching image index: {str(e)}", exc_info=True)
+        raise
+
+
 if __name__ == "__main__":
     mcp.run()
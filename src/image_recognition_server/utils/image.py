@@ -8,6 +8,13 @@ from PIL import Image, UnidentifiedImageError
 
 logger = logging.getLogger(__name__)
 
+FORMAT_TO_MIME = {
+    "JPEG": "image/jpeg",
+    "PNG": "image/png",
+    "GIF": "image/gif",
+    "WEBP": "image/webp",
+}
+
 
 def image_to_base64(image_path: str) -> Tuple[str, str]:
     """Convert an image file to base64 string and detect its MIME type.
@@ -31,13 +38,7 @@ def image_to_base64(image_path: str) -> Tuple[str, str]:
         # Try to open and validate the image
         with Image.open(path) as img:
             # Get image format and convert to MIME type
-            format_to_mime = {
-                "JPEG": "image/jpeg",
-                "PNG": "image/png",
-                "GIF": "image/gif",
-                "WEBP": "image/webp",
-            }
-            mime_type = format_to_mime.get(img.format, "application/octet-stream")
+            mime_type = FORMAT_TO_MIME.get(img.format or "", "application/octet-stream")
             logger.info(
                 f"Processing image: {image_path}, format: {img.format}, size: {img.size}"
             )
@@ -0,0 +1,353 @@
+import asyncio
+import base64
+import hashlib
+import io
+import logging
+import os
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from PIL import Image
+
+from .ocr import extract_text_cached
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS images (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    mtime REAL NOT NULL,
+    content_hash TEXT NOT NULL,
+    prompt_hash TEXT,
+    phash TEXT,
+    description TEXT,
+    ocr_text TEXT,
+    indexed_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS images_content_hash ON images (content_hash);
+"""
+
+# Porter stemming so that e.g. "invoice" also matches "invoices"
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS images_fts USING fts5 (
+    path UNINDEXED, description, ocr_text, tokenize='porter unicode61'
+);
+"""
+
+DescribeFunc = Callable[[str, str], Awaitable[str]]
+
+
+def perceptual_hash(image: Image.Image, hash_size: int = 8) -> str:
+    """Compute a difference hash (dHash) of an image.
+
+    Args:
+        image: PIL Image object to hash
+        hash_size: Hash width in bits per row
+
+    Returns:
+        str: Hex encoded hash of hash_size * hash_size bits
+    """
+    resized = image.convert("L").resize((hash_size + 1, hash_size))
+    pixels = resized.tobytes()
+    bits = 0
+    for row in range(hash_size):
+        for col in range(hash_size):
+            left = pixels[row * (hash_size + 1) + col]
+            right = pixels[row * (hash_size + 1) + col + 1]
+            bits = (bits << 1) | (left > right)
+    return f"{bits:0{hash_size * hash_size // 4}x}"
+
+
+def _analyze_file(path: Path, use_ocr: bool) -> Dict[str, Any]:
+    """Read an image file and compute its hashes and OCR text (runs in a worker)."""
+    data = path.read_bytes()
+    with Image.open(io.BytesIO(data)) as image:
+        phash = perceptual_hash(image)
+    return {
+        "data": data,
+        "content_hash": hashlib.sha256(data).hexdigest(),
+        "phash": phash,
+        "ocr_text": extract_text_cached(data) if use_ocr else None,
+    }
+
+
+def _prompt_hash(prompt: str) -> str:
+    """Hash a prompt so descriptions are only reused for the same prompt."""
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16]
+
+
+def _fts_query(query: str) -> str:
+    """Quote each search term so user input can't break FTS5 syntax."""
+    terms = [term.replace('"', '""') for term in query.split()]
+    return " ".join(f'"{term}"' for term in terms)
+
+
+class ImageIndex:
+    """Local SQLite/FTS5 index of image descriptions and OCR text."""
+
+    def __init__(self, db_path: str):
+        """Open (and create if needed) the index database.
+
+        Args:
+            db_path: Path to the SQLite database file
+        """
+        self.db_path = db_path
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(db_path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(SCHEMA)
+        self._migrate()
+        # Descriptions being generated, so duplicates in one crawl wait for
+        # the first result instead of calling the vision API again
+        self._inflight: Dict[Tuple[str, str], "asyncio.Future[Optional[str]]"] = {}
+
+    def _migrate(self) -> None:
+        """Upgrade indexes created by older versions.
+
+        Adds missing columns and rebuilds the full-text table from the stored
+        descriptions if it was created without the stemming tokenizer.
+        """
+        columns = {
+            row["name"] for row in self.conn.execute("PRAGMA table_info(images)")
+        }
+        if "prompt_hash" not in columns:
+            with self.conn:
+                self.conn.execute("ALTER TABLE images ADD COLUMN prompt_hash TEXT")
+
+        fts = self.conn.execute(
+            "SELECT sql FROM sqlite_master WHERE name = 'images_fts'"
+        ).fetchone()
+        if fts is None or "porter" not in fts["sql"]:
+            with self.conn:
+                if fts is not None:
+                    logger.info("Rebuilding image index full-text table")
+                    self.conn.execute("DROP TABLE images_fts")
+                self.conn.execute(FTS_SCHEMA)
+                self.conn.execute(
+                    "INSERT INTO images_fts (path, description, ocr_text) "
+                    "SELECT path, coalesce(description, ''), coalesce(ocr_text, '') "
+                    "FROM images"
+                )
+
+    def close(self) -> None:
+        """Close the database connection."""
+        self.conn.close()
+
+    def _get(self, path: str) -> Optional[sqlite3.Row]:
+        return self.conn.execute(
+            "SELECT * FROM images WHERE path = ?", (path,)
+        ).fetchone()
+
+    def _find_by_hash(
+        self, content_hash: str, prompt_hash: str
+    ) -> Optional[sqlite3.Row]:
+        return self.conn.execute(
+            "SELECT * FROM images WHERE content_hash = ? AND prompt_hash = ? LIMIT 1",
+            (content_hash, prompt_hash),
+        ).fetchone()
+
+    def _upsert(self, row: Dict[str, Any]) -> None:
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO images (path, size, mtime, content_hash, "
+                "prompt_hash, phash, description, ocr_text, indexed_at) "
+                "VALUES (:path, :size, :mtime, :content_hash, :prompt_hash, "
+                ":phash, :description, :ocr_text, :indexed_at)",
+                row,
+            )
+            self.conn.execute("DELETE FROM images_fts WHERE path = ?", (row["path"],))
+            self.conn.execute(
+                "INSERT INTO images_fts (path, description, ocr_text) "
+                "VALUES (?, ?, ?)",
+                (row["path"], row["description"] or "", row["ocr_text"] or ""),
+            )
+
+    def _remove(self, paths: List[str]) -> None:
+        with self.conn:
+            for path in paths:
+                self.conn.execute("DELETE FROM images WHERE path = ?", (path,))
+                self.conn.execute("DELETE FROM images_fts WHERE path = ?", (path,))
+
+    async def refresh(
+        self,
+        directory: str,
+        describe: DescribeFunc,
+        prompt: str = "Please describe this image in detail.",
+        recursive: bool = True,
+        max_workers: int = 4,
+        use_ocr: bool = False,
+    ) -> Dict[str, int]:
+        """Index a directory, reprocessing only new or changed files.
+
+        Files are skipped when path, size, mtime and prompt are unchanged.
+        Files whose content hash is already indexed (or being described in
+        this crawl) with the same prompt reuse that description instead of
+        calling the vision API. Entries for deleted files are removed.
+
+        Args:
+            directory: Directory to crawl
+            describe: Async function (base64_image, prompt) -> description
+            prompt: Prompt for vision AI
+            recursive: If True, include subdirectories
+            max_workers: Maximum number of files processed concurrently
+            use_ocr: If True, store Tesseract OCR text for each image
+
+        Returns:
+            Dict[str, int]: Counts of "indexed", "reused", "unchanged",
+                "removed" and "failed" files
+
+        Raises:
+            FileNotFoundError: If directory doesn't exist
+        """
+        root = Path(directory).resolve()
+        if not root.is_dir():
+            raise FileNotFoundError(f"Directory not found: {directory}")
+
+        pattern = "**/*" if recursive else "*"
+        files = [
+            p
+            for p in root.glob(pattern)
+            if p.is_file() and p.suffix.lower() in IMAGE_EXTENSIONS
+        ]
+        stats = {"indexed": 0, "reused": 0, "unchanged": 0, "removed": 0, "failed": 0}
+
+        # Drop entries for files that no longer exist under this directory
+        seen = {str(p) for p in files}
+        prefix = str(root) + os.sep
+        stale = [
+            row["path"]
+            for row in self.conn.execute("SELECT path FROM images")
+            if row["path"].startswith(prefix)
+            and row["path"] not in seen
+            and (recursive or os.path.dirname(row["path"]) == str(root))
+        ]
+        self._remove(stale)
+        stats["removed"] = len(stale)
+
+        semaphore = asyncio.Semaphore(max(1, max_workers))
+
+        async def process(path: Path) -> None:
+            async with semaphore:
+                try:
+                    await self._refresh_file(path, describe, prompt, use_ocr, stats)
+                except Exception as e:
+                    logger.warning(f"Failed to index {path}: {str(e)}")
+                    stats["failed"] += 1
+
+        await asyncio.gather(*(process(p) for p in files))
+        logger.info(f"Indexed directory {root}: {stats}")
+        return stats
+
+    async def _refresh_file(
+        self,
+        path: Path,
+        describe: DescribeFunc,
+        prompt: str,
+        use_ocr: bool,
+        stats: Dict[str, int],
+    ) -> None:
+        stat = path.stat()
+        prompt_hash = _prompt_hash(prompt)
+        existing = self._get(str(path))
+        if (
+            existing
+            and existing["size"] == stat.st_size
+            and existing["mtime"] == stat.st_mtime
+            and existing["prompt_hash"] == prompt_hash
+        ):
+            stats["unchanged"] += 1
+            return
+
+        analysis = await asyncio.to_thread(_analyze_file, path, use_ocr)
+        row = {
+            "path": str(path),
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "content_hash": analysis["content_hash"],
+            "prompt_hash": prompt_hash,
+            "phash": analysis["phash"],
+            "ocr_text": analysis["ocr_text"],
+            "indexed_at": time.time(),
+        }
+
+        # Touched or copied files keep the description of identical content
+        key = (analysis["content_hash"], prompt_hash)
+        if match := self._find_by_hash(*key):
+            row["description"] = match["description"]
+            if not use_ocr:
+                row["ocr_text"] = match["ocr_text"]
+            stats["reused"] += 1
+        elif key in self._inflight and (description := await self._inflight[key]):
+            row["description"] = description
+            stats["reused"] += 1
+        else:
+            row["description"] = await self._describe_once(
+                key, analysis["data"], describe, prompt
+            )
+            stats["indexed"] += 1
+
+        self._upsert(row)
+
+    async def _describe_once(
+        self,
+        key: Tuple[str, str],
+        data: bytes,
+        describe: DescribeFunc,
+        prompt: str,
+    ) -> str:
+        """Describe an image, sharing the result with duplicates in flight.
+
+        Waiters get None if the description fails and describe on their own.
+        """
+        future: "asyncio.Future[Optional[str]]" = (
+            asyncio.get_running_loop().create_future()
+        )
+        self._inflight[key] = future
+        try:
+            image_data = base64.b64encode(data).decode("utf-8")
+            description = await describe(image_data, prompt)
+            future.set_result(description)
+            return description
+        except BaseException:
+            future.set_result(None)
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    def search(
+        self, query: str, limit: int = 10, directory: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Find indexed images whose description or OCR text matches a query.
+
+        Args:
+            query: Search terms; all terms must match
+            limit: Maximum number of results
+            directory: Optional directory to restrict results to
+
+        Returns:
+            List[Dict[str, Any]]: Matches ordered by relevance, each with
+                "path", "snippet", "description" and "ocr_text"
+        """
+        if not query.strip():
+            return []
+
+        sql = (
+            "SELECT images.path, images.description, images.ocr_text, "
+            "snippet(images_fts, -1, '[', ']', '...', 12) AS snippet "
+            "FROM images_fts JOIN images ON images.path = images_fts.path "
+            "WHERE images_fts MATCH ?"
+        )
+        params: List[Any] = [_fts_query(query)]
+        if directory:
+            prefix = str(Path(directory).resolve()) + os.sep
+            sql += " AND substr(images.path, 1, ?) = ?"
+            params.extend([len(prefix), prefix])
+        sql += " ORDER BY rank LIMIT ?"
+        params.append(limit)
+
+        return [dict(row) for row in self.conn.execute(sql, params)]
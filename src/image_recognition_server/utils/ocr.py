@@ -1,10 +1,16 @@
+import hashlib
+import io
 import logging
 import os
-from typing import Optional
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 import pytesseract  # type: ignore
 from PIL import Image
 
+from .profiling import span
+
 logger = logging.getLogger(__name__)
 
 
@@ -14,14 +20,110 @@ class OCRError(Exception):
     pass
 
 
+class OCRCache:
+    """Thread-safe LRU cache for OCR results keyed by image content hash."""
+
+    def __init__(self, max_entries: int = 128):
+        """Initialize the cache.
+
+        Args:
+            max_entries: Maximum number of results to keep. 0 disables caching.
+        """
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[Any, ...], Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Tuple[Any, ...]) -> Tuple[bool, Any]:
+        """Look up a cached result.
+
+        Returns:
+            Tuple of (found, value)
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, self._entries[key]
+            self.misses += 1
+            return False, None
+
+    def set(self, key: Tuple[Any, ...], value: Any) -> None:
+        """Store a result, evicting the least recently used entry if full."""
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove all cached results."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+def _cache_size_from_env(default: int = 128) -> int:
+    """Read OCR_CACHE_SIZE, falling back to the default on invalid values."""
+    value = os.getenv("OCR_CACHE_SIZE")
+    try:
+        return int(value) if value else default
+    except ValueError:
+        logger.warning(f"Invalid value for OCR_CACHE_SIZE: {value}, using {default}")
+        return default
+
+
+ocr_cache = OCRCache(max_entries=_cache_size_from_env())
+
+
+def _configure_tesseract() -> None:
+    """Apply the TESSERACT_CMD environment variable, if set and non-empty."""
+    if tesseract_cmd := os.getenv("TESSERACT_CMD"):
+        if tesseract_cmd.strip():  # Only set if path is non-empty
+            pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+
+
+def _build_config(psm: Optional[int]) -> str:
+    """Build the Tesseract command line config for an optional PSM."""
+    return f"--psm {int(psm)}" if psm is not None else ""
+
+
+def _handle_ocr_exception(e: Exception, ocr_required: bool) -> None:
+    """Log an OCR failure and raise OCRError if OCR is required."""
+    error_msg = f"Failed to extract text using Tesseract: {str(e)}"
+    if "not installed" in str(e) or "not in your PATH" in str(e):
+        error_msg = (
+            "Tesseract OCR is not installed or not in PATH. "
+            "Please install Tesseract and ensure it's in your system PATH, "
+            "or set TESSERACT_CMD environment variable to the executable path."
+        )
+
+    logger.warning(error_msg)
+    if ocr_required:
+        raise OCRError(error_msg)
+
+
 def extract_text_from_image(
-    image: Image.Image, ocr_required: bool = False
+    image: Image.Image,
+    ocr_required: bool = False,
+    lang: Optional[str] = None,
+    psm: Optional[int] = None,
 ) -> Optional[str]:
     """Extract text from an image using Tesseract OCR.
 
     Args:
         image: PIL Image object to process
         ocr_required: If True, raise error when OCR fails. If False, return None.
+        lang: Optional Tesseract language(s), e.g. "eng" or "eng+deu"
+        psm: Optional Tesseract page segmentation mode
 
     Returns:
         Optional[str]: Extracted text if successful, None if Tesseract is not available
@@ -31,13 +133,15 @@ def extract_text_from_image(
         OCRError: If OCR fails and ocr_required is True
     """
     try:
-        # Check if custom tesseract path is set in environment and not empty
-        if tesseract_cmd := os.getenv("TESSERACT_CMD"):
-            if tesseract_cmd.strip():  # Only set if path is non-empty
-                pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+        _configure_tesseract()
 
         # Extract text from image
-        text = pytesseract.image_to_string(image)
+        kwargs: Dict[str, Any] = {}
+        if lang:
+            kwargs["lang"] = lang
+        if config := _build_config(psm):
+            kwargs["config"] = config
+        text = pytesseract.image_to_string(image, **kwargs)
 
         # Clean and validate result
         text = text.strip()
@@ -50,15 +154,251 @@ def extract_text_from_image(
             return None
 
     except Exception as e:
-        error_msg = f"Failed to extract text using Tesseract: {str(e)}"
-        if "not installed" in str(e) or "not in your PATH" in str(e):
-            error_msg = (
-                "Tesseract OCR is not installed or not in PATH. "
-                "Please install Tesseract and ensure it's in your system PATH, "
-                "or set TESSERACT_CMD environment variable to the executable path."
+        _handle_ocr_exception(e, ocr_required)
+        return None
+
+
+def _group_lines(words: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Group words into lines with a union bounding box and mean confidence."""
+    lines: "OrderedDict[Tuple[int, int, int, int], List[Dict[str, Any]]]" = (
+        OrderedDict()
+    )
+    for word in words:
+        key = (word["page"], word["block"], word["paragraph"], word["line"])
+        lines.setdefault(key, []).append(word)
+
+    result = []
+    for line_words in lines.values():
+        left = min(w["left"] for w in line_words)
+        top = min(w["top"] for w in line_words)
+        right = max(w["left"] + w["width"] for w in line_words)
+        bottom = max(w["top"] + w["height"] for w in line_words)
+        result.append(
+            {
+                "text": " ".join(w["text"] for w in line_words),
+                "confidence": round(
+                    sum(w["confidence"] for w in line_words) / len(line_words), 2
+                ),
+                "left": left,
+                "top": top,
+                "width": right - left,
+                "height": bottom - top,
+            }
+        )
+    return result
+
+
+def extract_ocr_data(
+    image: Image.Image,
+    ocr_required: bool = False,
+    lang: Optional[str] = None,
+    psm: Optional[int] = None,
+    min_confidence: float = 0.0,
+) -> Optional[Dict[str, Any]]:
+    """Extract words and lines with bounding boxes and confidences.
+
+    Args:
+        image: PIL Image object to process
+        ocr_required: If True, raise error when OCR fails. If False, return None.
+        lang: Optional Tesseract language(s), e.g. "eng" or "eng+deu"
+        psm: Optional Tesseract page segmentation mode
+        min_confidence: Drop words with a confidence (0-100) below this value
+
+    Returns:
+        Optional[Dict[str, Any]]: Dict with "text", "words" and "lines" keys, or
+            None if no text was found or Tesseract is not available and
+            ocr_required is False
+
+    Raises:
+        OCRError: If OCR fails and ocr_required is True
+    """
+    words = _image_to_words(image, ocr_required=ocr_required, lang=lang, psm=psm)
+    if words is None:
+        return None
+    return filter_ocr_words(words, min_confidence)
+
+
+def _image_to_words(
+    image: Image.Image,
+    ocr_required: bool = False,
+    lang: Optional[str] = None,
+    psm: Optional[int] = None,
+) -> Optional[List[Dict[str, Any]]]:
+    """Run Tesseract image_to_data and return all recognized words."""
+    try:
+        _configure_tesseract()
+
+        data = pytesseract.image_to_data(
+            image,
+            lang=lang,
+            config=_build_config(psm),
+            output_type=pytesseract.Output.DICT,
+        )
+
+        words = []
+        for i, text in enumerate(data.get("text", [])):
+            text = (text or "").strip()
+            conf = float(data["conf"][i])
+            # Tesseract reports -1 for structural (non-word) rows
+            if not text or conf < 0:
+                continue
+            words.append(
+                {
+                    "text": text,
+                    "confidence": conf,
+                    "left": int(data["left"][i]),
+                    "top": int(data["top"][i]),
+                    "width": int(data["width"][i]),
+                    "height": int(data["height"][i]),
+                    "page": int(data["page_num"][i]),
+                    "block": int(data["block_num"][i]),
+                    "paragraph": int(data["par_num"][i]),
+                    "line": int(data["line_num"][i]),
+                }
             )
 
-        logger.warning(error_msg)
-        if ocr_required:
+        logger.info(f"Tesseract layout OCR found {len(words)} words")
+        return words
+
+    except Exception as e:
+        _handle_ocr_exception(e, ocr_required)
+        return None
+
+
+def filter_ocr_words(
+    words: List[Dict[str, Any]], min_confidence: float = 0.0
+) -> Optional[Dict[str, Any]]:
+    """Filter words by confidence and build the layout result.
+
+    Args:
+        words: Words as returned by Tesseract layout OCR
+        min_confidence: Drop words with a confidence (0-100) below this value
+
+    Returns:
+        Optional[Dict[str, Any]]: Layout result, or None if no words remain
+    """
+    kept = [w for w in words if w["confidence"] >= min_confidence]
+    if not kept:
+        logger.info("No text found in image above confidence threshold")
+        return None
+
+    lines = _group_lines(kept)
+    return {
+        "text": "\n".join(line["text"] for line in lines),
+        "words": kept,
+        "lines": lines,
+    }
+
+
+def _cached(
+    image_bytes: bytes,
+    mode: str,
+    lang: Optional[str],
+    psm: Optional[int],
+    compute: Callable[[Image.Image], Any],
+) -> Any:
+    """Return a cached OCR result for the image bytes, computing it on a miss.
+
+    compute must raise OCRError on failure; failures are not cached so that a
+    missing Tesseract install is retried once it becomes available. Bytes
+    that can't be decoded as an image are reported as OCRError as well.
+    """
+    with span("ocr", mode=mode, cache_hit=False) as record:
+        key = (hashlib.sha256(image_bytes).hexdigest(), mode, lang, psm)
+        found, value = ocr_cache.get(key)
+        if found:
+            logger.debug(
+                f"OCR cache hit for {mode} ({key[0][:12]}), "
+                f"{ocr_cache.hits} hits / {ocr_cache.misses} misses"
+            )
+            if record is not None:
+                record["attributes"]["cache_hit"] = True
+            return value
+
+        try:
+            image = Image.open(io.BytesIO(image_bytes))
+        except OSError as e:
+            error_msg = f"Failed to decode image for OCR: {str(e)}"
+            logger.warning(error_msg)
             raise OCRError(error_msg)
+
+        with image:
+            value = compute(image)
+        ocr_cache.set(key, value)
+        return value
+
+
+def extract_text_cached(
+    image_bytes: bytes,
+    ocr_required: bool = False,
+    lang: Optional[str] = None,
+    psm: Optional[int] = None,
+) -> Optional[str]:
+    """Extract plain text from raw image bytes, reusing cached results.
+
+    Args:
+        image_bytes: Encoded image bytes
+        ocr_required: If True, raise error when OCR fails. If False, return None.
+        lang: Optional Tesseract language(s)
+        psm: Optional Tesseract page segmentation mode
+
+    Returns:
+        Optional[str]: Extracted text, or None if no text was found
+
+    Raises:
+        OCRError: If OCR fails and ocr_required is True
+    """
+    try:
+        return _cached(
+            image_bytes,
+            "text",
+            lang,
+            psm,
+            lambda image: extract_text_from_image(
+                image, ocr_required=True, lang=lang, psm=psm
+            ),
+        )
+    except OCRError:
+        if ocr_required:
+            raise
+        return None
+
+
+def extract_ocr_data_cached(
+    image_bytes: bytes,
+    ocr_required: bool = False,
+    lang: Optional[str] = None,
+    psm: Optional[int] = None,
+    min_confidence: float = 0.0,
+) -> Optional[Dict[str, Any]]:
+    """Extract layout-aware OCR data from raw image bytes, reusing cached results.
+
+    The unfiltered word list is cached, so calls that only differ in
+    min_confidence never re-run Tesseract.
+
+    Args:
+        image_bytes: Encoded image bytes
+        ocr_required: If True, raise error when OCR fails. If False, return None.
+        lang: Optional Tesseract language(s)
+        psm: Optional Tesseract page segmentation mode
+        min_confidence: Drop words with a confidence (0-100) below this value
+
+    Returns:
+        Optional[Dict[str, Any]]: Layout result, see extract_ocr_data
+
+    Raises:
+        OCRError: If OCR fails and ocr_required is True
+    """
+    try:
+        words = _cached(
+            image_bytes,
+            "data",
+            lang,
+            psm,
+            lambda image: _image_to_words(image, ocr_required=True, lang=lang, psm=psm),
+        )
+    except OCRError:
+        if ocr_required:
+            raise
         return None
+    return filter_ocr_words(words, min_confidence)
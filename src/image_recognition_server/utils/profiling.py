@@ -0,0 +1,303 @@
+import cProfile
+import heapq
+import json
+import logging
+import os
+import random
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "mcp-image-recognition"
+
+_current_trace: ContextVar[Optional["Trace"]] = ContextVar(
+    "current_trace", default=None
+)
+_current_span: ContextVar[Optional[str]] = ContextVar("current_span", default=None)
+
+# Min-heap of (duration_ms, profile_path) for the slowest profiled requests
+_slowest_profiles: List[Tuple[float, str]] = []
+_profiles_lock = threading.Lock()
+
+# Only one cProfile can be enabled per thread (3.12+ raises otherwise), and
+# overlapping profiles on the event loop thread would mix their data
+_profiler_active = False
+_profiler_lock = threading.Lock()
+
+
+def profiling_enabled() -> bool:
+    """Return True if request profiling is enabled."""
+    return os.getenv("ENABLE_PROFILING", "false").lower() == "true"
+
+
+def _number_from_env(name: str, default: float) -> float:
+    """Read a numeric setting, falling back to the default on invalid values."""
+    value = os.getenv(name)
+    try:
+        return float(value) if value else default
+    except ValueError:
+        logger.warning(f"Invalid value for {name}: {value}, using {default}")
+        return default
+
+
+def _new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    """Convert an attribute value to an OTLP AnyValue."""
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class Trace:
+    """Spans recorded for a single request."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.trace_id = _new_id(128)
+        self.spans: List[Dict[str, Any]] = []
+
+    @property
+    def duration_ms(self) -> float:
+        """Duration of the root span in milliseconds."""
+        root = self.spans[-1] if self.spans else None
+        if not root or root.get("end") is None:
+            return 0.0
+        return (root["end"] - root["start"]) / 1_000_000
+
+    def timings(self) -> Dict[str, float]:
+        """Return milliseconds per stage, summed over spans with the same name.
+
+        Stages are ordered by start time, with the request total under "total".
+        """
+        result: Dict[str, float] = {}
+        for span in sorted(self.spans, key=lambda s: s["start"]):
+            if span["end"] is None or span["parent_id"] is None:
+                continue
+            ms = (span["end"] - span["start"]) / 1_000_000
+            result[span["name"]] = round(result.get(span["name"], 0.0) + ms, 3)
+        result["total"] = round(self.duration_ms, 3)
+        return result
+
+    def to_otlp(self) -> Dict[str, Any]:
+        """Export the trace as an OTLP/JSON ExportTraceServiceRequest."""
+        spans = []
+        for span in self.spans:
+            otlp_span = {
+                "traceId": self.trace_id,
+                "spanId": span["span_id"],
+                "name": span["name"],
+                "kind": 1,
+                "startTimeUnixNano": str(span["start"]),
+                "endTimeUnixNano": str(span["end"] or span["start"]),
+                "attributes": [
+                    {"key": k, "value": _otlp_value(v)}
+                    for k, v in span["attributes"].items()
+                ],
+                "status": {"code": 2 if span.get("error") else 1},
+            }
+            if span["parent_id"]:
+                otlp_span["parentSpanId"] = span["parent_id"]
+            spans.append(otlp_span)
+
+        return {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": [
+                            {
+                                "key": "service.name",
+                                "value": {"stringValue": SERVICE_NAME},
+                            }
+                        ]
+                    },
+                    "scopeSpans": [
+                        {"scope": {"name": "image_recognition_server"}, "spans": spans}
+                    ],
+                }
+            ]
+        }
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Optional[Dict[str, Any]]]:
+    """Record a span for a stage of the current request.
+
+    This is a no-op when no trace is active, so it is cheap to leave in place.
+
+    Args:
+        name: Stage name, e.g. "ocr" or "provider"
+        **attributes: Span attributes; more can be added to the yielded dict's
+            "attributes" while the span is open
+
+    Yields:
+        Optional[Dict[str, Any]]: The span record, or None if not tracing
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield None
+        return
+
+    record: Dict[str, Any] = {
+        "span_id": _new_id(64),
+        "parent_id": _current_span.get(),
+        "name": name,
+        "attributes": dict(attributes),
+        "start": time.time_ns(),
+        "end": None,
+    }
+    token = _current_span.set(record["span_id"])
+    try:
+        yield record
+    except BaseException:
+        record["error"] = True
+        raise
+    finally:
+        record["end"] = time.time_ns()
+        _current_span.reset(token)
+        trace.spans.append(record)
+
+
+@contextmanager
+def trace_request(name: str, force: bool = False) -> Iterator[Optional[Trace]]:
+    """Trace a tool request, exporting spans and sampling a cProfile.
+
+    Nested calls (e.g. describe_image_from_file calling describe_image) are
+    recorded as a span of the outer trace.
+
+    Args:
+        name: Name of the root span, usually the tool name
+        force: Collect spans even if ENABLE_PROFILING is off (for timings)
+
+    Yields:
+        Optional[Trace]: The active trace, or None if not tracing
+    """
+    parent = _current_trace.get()
+    if parent is not None:
+        with span(name):
+            yield parent
+        return
+
+    if not (force or profiling_enabled()):
+        yield None
+        return
+
+    trace = Trace(name)
+    token = _current_trace.set(trace)
+    profiler = None
+    try:
+        if profiling_enabled() and random.random() < _number_from_env(
+            "PROFILING_SAMPLE_RATE", 0
+        ):
+            profiler = _start_profiler()
+        with span(name, **{"service.name": SERVICE_NAME}):
+            yield trace
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            _release_profiler()
+        _current_trace.reset(token)
+        if profiling_enabled():
+            _export(trace, profiler)
+
+
+def _start_profiler() -> Optional[cProfile.Profile]:
+    """Start a cProfile unless one is already running.
+
+    Requests sampled while another request is being profiled are skipped.
+    """
+    global _profiler_active
+    with _profiler_lock:
+        if _profiler_active:
+            logger.debug("Skipping profile, another request is being profiled")
+            return None
+        _profiler_active = True
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError as e:
+        # Another profiling tool (e.g. a debugger) is already active
+        logger.warning(f"Could not start profiler: {str(e)}")
+        _release_profiler()
+        return None
+    return profiler
+
+
+def _release_profiler() -> None:
+    global _profiler_active
+    with _profiler_lock:
+        _profiler_active = False
+
+
+def _export(trace: Trace, profiler: Optional[cProfile.Profile]) -> None:
+    """Export a finished trace and keep its profile if it's among the slowest."""
+    logger.debug(f"Request timings for {trace.name}: {trace.timings()}")
+    try:
+        payload = json.dumps(trace.to_otlp())
+        if trace_file := os.getenv("PROFILING_TRACE_FILE"):
+            with open(trace_file, "a", encoding="utf-8") as f:
+                f.write(payload + "\n")
+        if endpoint := os.getenv("PROFILING_OTLP_ENDPOINT"):
+            threading.Thread(
+                target=_post_otlp, args=(endpoint, payload), daemon=True
+            ).start()
+        if profiler is not None:
+            _keep_slowest_profile(trace, profiler)
+    except Exception as e:
+        logger.warning(f"Failed to export profiling data: {str(e)}")
+
+
+def _post_otlp(endpoint: str, payload: str) -> None:
+    """Send an OTLP/JSON payload to a collector's HTTP endpoint."""
+    url = endpoint.rstrip("/")
+    if not url.endswith("/v1/traces"):
+        url += "/v1/traces"
+    request = urllib.request.Request(
+        url,
+        data=payload.encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+        method="POST",
+    )
+    try:
+        with urllib.request.urlopen(request, timeout=5):
+            pass
+    except Exception as e:
+        logger.warning(f"Failed to send trace to {url}: {str(e)}")
+
+
+def _keep_slowest_profile(trace: Trace, profiler: cProfile.Profile) -> None:
+    """Dump pstats for the N slowest sampled requests, deleting faster ones."""
+    top_n = int(_number_from_env("PROFILING_TOP_N", 5))
+    if top_n <= 0:
+        return
+    profile_dir = Path(
+        os.getenv("PROFILING_DIR")
+        or os.path.join(os.path.dirname(os.path.dirname(__file__)), "profiles")
+    )
+    duration = trace.duration_ms
+
+    with _profiles_lock:
+        if len(_slowest_profiles) >= top_n and duration <= _slowest_profiles[0][0]:
+            return
+        profile_dir.mkdir(parents=True, exist_ok=True)
+        path = profile_dir / f"{trace.name}-{int(duration)}ms-{trace.trace_id[:8]}.prof"
+        profiler.dump_stats(str(path))
+        heapq.heappush(_slowest_profiles, (duration, str(path)))
+        logger.info(f"Saved profile for slow request ({duration:.0f} ms): {path}")
+
+        while len(_slowest_profiles) > top_n:
+            _, evicted = heapq.heappop(_slowest_profiles)
+            Path(evicted).unlink(missing_ok=True)
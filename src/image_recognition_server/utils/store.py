@@ -0,0 +1,131 @@
+import hashlib
+import io
+import json
+import logging
+import os
+import re
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from PIL import Image, UnidentifiedImageError
+
+from .image import FORMAT_TO_MIME
+
+logger = logging.getLogger(__name__)
+
+IMAGE_ID_PATTERN = re.compile(r"^img_[0-9a-f]{16}$")
+
+
+class ImageStore:
+    """Content-addressed on-disk store for registered images.
+
+    Images are stored once per content hash and referred to by a short ID.
+    A metadata file next to each image records its MIME type and any file IDs
+    the image was uploaded under at a provider.
+    """
+
+    def __init__(self, root: str):
+        """Initialize the store.
+
+        Args:
+            root: Directory to store images in, created if needed
+        """
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def _image_path(self, image_id: str) -> Path:
+        if not IMAGE_ID_PATTERN.match(image_id):
+            raise ValueError(f"Invalid image ID: {image_id}")
+        return self.root / image_id
+
+    def _meta_path(self, image_id: str) -> Path:
+        return self._image_path(image_id).with_suffix(".json")
+
+    def put(self, data: bytes) -> str:
+        """Store image bytes, returning the existing ID if already stored.
+
+        Args:
+            data: Encoded image bytes
+
+        Returns:
+            str: Image ID derived from the content hash
+
+        Raises:
+            ValueError: If data is not a valid image, or in a format the vision
+                providers don't accept
+        """
+        try:
+            with Image.open(io.BytesIO(data)) as img:
+                image_format = img.format or ""
+        except UnidentifiedImageError as e:
+            raise ValueError(f"Invalid image format: {str(e)}")
+        if image_format not in FORMAT_TO_MIME:
+            raise ValueError(
+                f"Unsupported image format: {image_format or 'unknown'}, "
+                f"expected one of {', '.join(FORMAT_TO_MIME)}"
+            )
+        mime_type = FORMAT_TO_MIME[image_format]
+
+        image_id = "img_" + hashlib.sha256(data).hexdigest()[:16]
+        path = self._image_path(image_id)
+        with self._lock:
+            if path.exists():
+                logger.debug(f"Image already registered: {image_id}")
+                return image_id
+            _atomic_write(path, data)
+            self._write_meta(image_id, {"mime_type": mime_type, "file_ids": {}})
+
+        logger.info(f"Registered image {image_id} ({len(data)} bytes, {mime_type})")
+        return image_id
+
+    def get(self, image_id: str) -> bytes:
+        """Load the bytes of a registered image.
+
+        Raises:
+            ValueError: If the image ID is invalid or not registered
+        """
+        path = self._image_path(image_id)
+        try:
+            return path.read_bytes()
+        except FileNotFoundError:
+            raise ValueError(f"Unknown image ID: {image_id}")
+
+    def get_meta(self, image_id: str) -> Dict[str, Any]:
+        """Load the metadata of a registered image."""
+        try:
+            with self._meta_path(image_id).open(encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise ValueError(f"Unknown image ID: {image_id}")
+
+    def get_file_id(self, image_id: str, provider: str) -> Optional[str]:
+        """Return the provider file ID an image was uploaded under, if any."""
+        return self.get_meta(image_id)["file_ids"].get(provider)
+
+    def set_file_id(self, image_id: str, provider: str, file_id: Optional[str]) -> None:
+        """Record (or with None, forget) a provider file ID for an image."""
+        with self._lock:
+            meta = self.get_meta(image_id)
+            if file_id:
+                meta["file_ids"][provider] = file_id
+            else:
+                meta["file_ids"].pop(provider, None)
+            self._write_meta(image_id, meta)
+
+    def _write_meta(self, image_id: str, meta: Dict[str, Any]) -> None:
+        _atomic_write(self._meta_path(image_id), json.dumps(meta).encode("utf-8"))
+
+
+def _atomic_write(path: Path, data: bytes) -> None:
+    """Write a file so readers never see partial content."""
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except Exception:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
@@ -1,6 +1,7 @@
 """Vision API integrations for image recognition."""
 
 from .anthropic import AnthropicVision
+from .errors import FileReferenceError
 from .openai import OpenAIVision
 
-__all__ = ["AnthropicVision", "OpenAIVision"]
+__all__ = ["AnthropicVision", "FileReferenceError", "OpenAIVision"]
@@ -1,14 +1,42 @@
 import logging
 import os
+import re
 from typing import Optional
 
-from anthropic import Anthropic, APIConnectionError, APIError, APITimeoutError
+from anthropic import (Anthropic, APIConnectionError, APIError, APIStatusError,
+                       APITimeoutError)
 from anthropic.types import ImageBlockParam, MessageParam, TextBlockParam
+from anthropic.types.beta import (BetaImageBlockParam, BetaMessageParam,
+                                  BetaTextBlockParam)
+
+from .errors import FileReferenceError
 
 logger = logging.getLogger(__name__)
 
+FILES_API_BETA = "files-api-2025-04-14"
+
+
+# Matches "file", "files" and "file_id" but not e.g. "profile"
+FILE_REFERENCE_PATTERN = re.compile(r"\bfiles?(_id)?\b", re.IGNORECASE)
+
+
+def _is_file_reference_error(e: APIStatusError) -> bool:
+    """Return True if an API error says the referenced file is missing or invalid.
+
+    Only 400 and 404 errors whose message refers to the file count, since a
+    404 is also returned for e.g. an unknown model name.
+    """
+    if e.status_code not in (400, 404):
+        return False
+    message = e.message
+    if isinstance(e.body, dict) and isinstance(e.body.get("error"), dict):
+        message = str(e.body["error"].get("message", message))
+    return bool(FILE_REFERENCE_PATTERN.search(message))
+
 
 class AnthropicVision:
+    provider = "anthropic"
+
     def __init__(self, api_key: Optional[str] = None):
         """Initialize Anthropic Vision client.
 
@@ -28,21 +56,36 @@ class AnthropicVision:
         image: str,
         prompt: str = "Please describe this image in detail.",
         mime_type="image/png",
+        model: Optional[str] = None,
+        file_id: Optional[str] = None,
     ) -> str:
         """Describe an image using Anthropic's Claude Vision.
 
         Args:
             image: string containing the base64 encoded image.
             prompt: Optional string containing the prompt.
+            model: Optional model override. Defaults to ANTHROPIC_MODEL.
+            file_id: Optional Files API ID of a previously uploaded image to
+                reference instead of sending the base64 data.
 
 
         Returns:
             str: Description of the image
 
         Raises:
+            FileReferenceError: If file_id refers to a missing or invalid file
             Exception: If API call fails
         """
         try:
+            # Get model from environment, default to claude-3.5-sonnet-beta
+            model_name = (
+                model
+                if model
+                else os.getenv("ANTHROPIC_MODEL", "claude-3.5-sonnet-beta")
+            )
+
+            if file_id:
+                return self._describe_file(file_id, prompt, model_name)
 
             image_block = ImageBlockParam(
                 type="image",
@@ -58,12 +101,9 @@ class AnthropicVision:
                 }
             ]
 
-            # Get model from environment, default to claude-3.5-sonnet-beta
-            model = os.getenv("ANTHROPIC_MODEL", "claude-3.5-sonnet-beta")
-
             # Make API call
             response = self.client.messages.create(
-                model=model, max_tokens=1024, messages=messages
+                model=model_name, max_tokens=1024, messages=messages
             )
 
             # Extract text from content blocks
@@ -83,6 +123,12 @@ class AnthropicVision:
         except APIConnectionError as e:
             logger.error(f"Anthropic API connection error: {str(e)}")
             raise Exception(f"Connection error: {str(e)}")
+        except APIStatusError as e:
+            if file_id and _is_file_reference_error(e):
+                logger.warning(f"Anthropic file reference {file_id} invalid: {e}")
+                raise FileReferenceError(f"Invalid file reference: {str(e)}")
+            logger.error(f"Anthropic API error: {str(e)}")
+            raise Exception(f"API error: {str(e)}")
         except APIError as e:
             logger.error(f"Anthropic API error: {str(e)}")
             raise Exception(f"API error: {str(e)}")
@@ -91,3 +137,46 @@ class AnthropicVision:
                 f"Unexpected error in Anthropic Vision: {str(e)}", exc_info=True
             )
             raise Exception(f"Unexpected error: {str(e)}")
+
+    def _describe_file(self, file_id: str, prompt: str, model: str) -> str:
+        """Describe an uploaded image, which requires the Files API beta."""
+        image_block = BetaImageBlockParam(
+            type="image", source={"type": "file", "file_id": file_id}
+        )
+        text_block = BetaTextBlockParam(type="text", text=prompt)
+        messages: list[BetaMessageParam] = [
+            {"role": "user", "content": [image_block, text_block]}
+        ]
+
+        response = self.client.beta.messages.create(
+            model=model, max_tokens=1024, messages=messages, betas=[FILES_API_BETA]
+        )
+
+        description = [block.text for block in response.content if block.type == "text"]
+        if description:
+            return " ".join(description)
+        return "No description available."
+
+    def upload_image(self, data: bytes, mime_type: str, filename: str) -> str:
+        """Upload an image with the Files API so it can be referenced by ID.
+
+        Args:
+            data: Encoded image bytes
+            mime_type: MIME type of the image
+            filename: Name to upload the file under
+
+        Returns:
+            str: File ID to pass as file_id to describe_image
+
+        Raises:
+            Exception: If the upload fails
+        """
+        try:
+            metadata = self.client.beta.files.upload(
+                file=(filename, data, mime_type), betas=[FILES_API_BETA]
+            )
+            logger.info(f"Uploaded {filename} to Anthropic Files API: {metadata.id}")
+            return metadata.id
+        except APIError as e:
+            logger.error(f"Anthropic file upload error: {str(e)}")
+            raise Exception(f"API error: {str(e)}")
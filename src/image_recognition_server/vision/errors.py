@@ -0,0 +1,4 @@
+class FileReferenceError(Exception):
+    """Exception raised when a referenced provider file is missing or invalid."""
+
+    pass
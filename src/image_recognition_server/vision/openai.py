@@ -9,6 +9,8 @@ logger = logging.getLogger(__name__)
 
 
 class OpenAIVision:
+    provider = "openai"
+
     def __init__(self, api_key: Optional[str] = None):
         """Initialize OpenAI Vision client.
 
@@ -31,12 +33,14 @@ class OpenAIVision:
         image: str,
         prompt: str = "Please describe this image in detail.",
         mime_type="image/png",
+        model: Optional[str] = None,
     ) -> str:
         """Describe an image using OpenAI's GPT-4 Vision.
 
         Args:
             image: String containing base64 encoded image.
             prompt: String containing the prompt.
+            model: Optional model override. Defaults to OPENAI_MODEL.
 
         Returns:
             str: Description of the image
@@ -46,11 +50,11 @@ class OpenAIVision:
         """
         try:
             # Get model from environment, default to gpt-4o-mini
-            model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+            model_name = model if model else os.getenv("OPENAI_MODEL", "gpt-4o-mini")
 
             # Create message content
             response = await self.client.chat.completions.create(
-                model=model,
+                model=model_name,
                 messages=[
                     {
                         "role": "user",
@@ -0,0 +1,273 @@
+import asyncio
+import base64
+import inspect
+import io
+import json
+import logging
+import os
+from typing import Any, Dict, Optional, Tuple
+
+from PIL import Image
+
+from ..utils.ocr import extract_text_cached
+from ..utils.profiling import span
+from .errors import FileReferenceError
+
+logger = logging.getLogger(__name__)
+
+# Default routing rules, overridable through ROUTING_* environment variables
+# and per provider through <PROVIDER>_ROUTING_* (e.g. OPENAI_ROUTING_MAX_PIXELS)
+DEFAULT_RULES: Dict[str, float] = {
+    # Images above this pixel count go straight to the large model
+    "max_pixels": 4_000_000,
+    # Images above this Shannon entropy (bits, 0-8) go straight to the large model
+    "max_entropy": 7.5,
+    # Images with more OCR characters per megapixel go straight to the large model
+    "max_text_density": 2000,
+    # Small-model answers shorter than this are escalated, for prompts asking
+    # for a description (short answers to direct questions are fine)
+    "min_answer_chars": 40,
+}
+
+# Phrases in a small-model answer that indicate low confidence
+UNCERTAIN_PHRASES = (
+    "i'm not sure",
+    "i am not sure",
+    "i cannot",
+    "i can't",
+    "unable to",
+    "unclear",
+    "hard to tell",
+    "difficult to determine",
+    "not possible to determine",
+    "no description available",
+)
+
+# Words that mark a prompt as asking for a description rather than a short answer
+DESCRIPTIVE_WORDS = ("describe", "description", "detail", "explain")
+
+
+def routing_enabled() -> bool:
+    """Return True if cascaded model routing is enabled."""
+    return os.getenv("ENABLE_ROUTING", "false").lower() == "true"
+
+
+def get_routing_rules(provider: str) -> Dict[str, Any]:
+    """Get the routing rules for a provider from environment settings.
+
+    Args:
+        provider: Provider name, e.g. "anthropic" or "openai"
+
+    Returns:
+        Dict[str, Any]: Rules including the provider's "small_model" (None if
+            not configured) and numeric thresholds
+    """
+    prefix = provider.upper()
+    rules: Dict[str, Any] = {"small_model": os.getenv(f"{prefix}_SMALL_MODEL")}
+    for name, default in DEFAULT_RULES.items():
+        env_name = f"ROUTING_{name.upper()}"
+        value = os.getenv(f"{prefix}_{env_name}") or os.getenv(env_name)
+        try:
+            rules[name] = float(value) if value else default
+        except ValueError:
+            logger.warning(f"Invalid value for {env_name}: {value}, using {default}")
+            rules[name] = default
+    return rules
+
+
+def compute_image_features(
+    image_bytes: bytes, use_ocr: bool = False, max_pixels: Optional[float] = None
+) -> Dict[str, Any]:
+    """Compute cheap local features used for routing decisions.
+
+    Args:
+        image_bytes: Encoded image bytes
+        use_ocr: If True, include OCR text density (uses the OCR cache)
+        max_pixels: If the image is larger, skip entropy and OCR density since
+            the image goes to the large model anyway
+
+    Returns:
+        Dict[str, Any]: width, height, pixels, entropy and text_density
+            (OCR characters per megapixel, 0 if OCR is disabled or unavailable).
+            entropy and text_density are None when skipped.
+    """
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        width, height = image.size
+        pixels = width * height
+        if max_pixels is not None and pixels > max_pixels:
+            return {
+                "width": width,
+                "height": height,
+                "pixels": pixels,
+                "entropy": None,
+                "text_density": None,
+            }
+
+        # Entropy of a small grayscale thumbnail is cheap and stable enough.
+        # draft() lets JPEG decode at reduced size, and thumbnailing before
+        # the conversion avoids a full-resolution grayscale copy.
+        image.draft("L", (256, 256))
+        thumbnail = image.copy()
+        thumbnail.thumbnail((256, 256))
+        entropy = thumbnail.convert("L").entropy()
+
+    text_density = 0.0
+    if use_ocr:
+        ocr_text = extract_text_cached(image_bytes)
+        if ocr_text and pixels:
+            text_density = len(ocr_text) / (pixels / 1_000_000)
+
+    return {
+        "width": width,
+        "height": height,
+        "pixels": pixels,
+        "entropy": round(entropy, 3),
+        "text_density": round(text_density, 1),
+    }
+
+
+def check_features(features: Dict[str, Any], rules: Dict[str, Any]) -> Optional[str]:
+    """Return the reason the image needs the large model, or None."""
+    if features["pixels"] > rules["max_pixels"]:
+        return "pixels"
+    if (features["entropy"] or 0) > rules["max_entropy"]:
+        return "entropy"
+    if (features["text_density"] or 0) > rules["max_text_density"]:
+        return "text_density"
+    return None
+
+
+def check_answer(
+    answer: Optional[str], rules: Dict[str, Any], prompt: str = ""
+) -> Optional[str]:
+    """Return the reason a small-model answer should be escalated, or None.
+
+    min_answer_chars only applies to prompts asking for a description (or
+    no prompt), so "Red." is an acceptable answer to "What color is it?".
+    """
+    min_chars = rules["min_answer_chars"] if _is_descriptive(prompt) else 1
+    if not answer or len(answer.strip()) < min_chars:
+        return "short_answer"
+    lowered = answer.lower()
+    for phrase in UNCERTAIN_PHRASES:
+        if phrase in lowered:
+            return "uncertain_answer"
+    return None
+
+
+def _is_descriptive(prompt: str) -> bool:
+    """Return True if a prompt asks for a description rather than a short answer."""
+    lowered = prompt.lower()
+    return not lowered.strip() or any(word in lowered for word in DESCRIPTIVE_WORDS)
+
+
+async def call_vision_client(
+    client: Any,
+    image_data: str,
+    prompt: str,
+    model: Optional[str] = None,
+    file_id: Optional[str] = None,
+    mime_type: Optional[str] = None,
+) -> str:
+    """Call a vision client, handling both sync (Anthropic) and async (OpenAI).
+
+    Sync clients run in a worker thread so they don't block the event loop.
+    file_id is only passed to clients when set, i.e. when the provider
+    supports file references.
+    """
+    kwargs: Dict[str, Any] = {"model": model} if model else {}
+    if file_id:
+        kwargs["file_id"] = file_id
+    if mime_type:
+        kwargs["mime_type"] = mime_type
+    provider = getattr(client, "provider", type(client).__name__.lower())
+    with span("provider", provider=provider, model=model or "default"):
+        if inspect.iscoroutinefunction(client.describe_image):
+            return await client.describe_image(image_data, prompt, **kwargs)
+        return await asyncio.to_thread(
+            client.describe_image, image_data, prompt, **kwargs
+        )
+
+
+def log_decision(provider: str, decision: Dict[str, Any]) -> None:
+    """Log a routing decision as a single JSON line for offline tuning."""
+    logger.info(f"Routing decision: {json.dumps({'provider': provider, **decision})}")
+
+
+async def describe_with_routing(
+    client: Any,
+    image_data: str,
+    prompt: str,
+    file_id: Optional[str] = None,
+    mime_type: Optional[str] = None,
+) -> str:
+    """Describe an image, trying the provider's small model first.
+
+    The small model is skipped when local heuristics already call for the
+    large model, and its answer is escalated when it looks low-confidence.
+    Routing is a no-op for providers without a configured small model.
+
+    Args:
+        client: Vision client (AnthropicVision or OpenAIVision)
+        image_data: Base64 encoded image data
+        prompt: Prompt for vision AI
+        file_id: Optional provider file ID to reference instead of image_data
+        mime_type: Optional MIME type of the image
+
+    Returns:
+        str: Description of the image
+    """
+    provider = getattr(client, "provider", type(client).__name__.lower())
+    options: Dict[str, Any] = {"file_id": file_id, "mime_type": mime_type}
+    rules = get_routing_rules(provider)
+    if not rules["small_model"]:
+        return await call_vision_client(client, image_data, prompt, **options)
+
+    use_ocr = (
+        os.getenv("ROUTING_USE_OCR", os.getenv("ENABLE_OCR", "false")).lower() == "true"
+    )
+    with span("routing.features"):
+        # Decoding (and OCR) is blocking, keep it off the event loop
+        features = await asyncio.to_thread(
+            compute_image_features,
+            base64.b64decode(image_data),
+            use_ocr,
+            rules["max_pixels"],
+        )
+    decision: Dict[str, Any] = {"features": features}
+
+    if reason := check_features(features, rules):
+        decision.update(model="large", reason=reason)
+        log_decision(provider, decision)
+        return await call_vision_client(client, image_data, prompt, **options)
+
+    answer, reason = await _try_small_model(client, image_data, prompt, rules, options)
+    if reason is None:
+        decision.update(model="small", reason="accepted")
+        log_decision(provider, decision)
+        return answer
+
+    decision.update(model="large", reason=reason)
+    log_decision(provider, decision)
+    return await call_vision_client(client, image_data, prompt, **options)
+
+
+async def _try_small_model(
+    client: Any,
+    image_data: str,
+    prompt: str,
+    rules: Dict[str, Any],
+    options: Dict[str, Any],
+) -> Tuple[str, Optional[str]]:
+    """Ask the small model and return (answer, escalation reason or None)."""
+    try:
+        answer = await call_vision_client(
+            client, image_data, prompt, model=rules["small_model"], **options
+        )
+    except FileReferenceError:
+        # Escalating would fail the same way, let the caller resend inline
+        raise
+    except Exception as e:
+        logger.warning(f"Small model failed, escalating: {str(e)}")
+        return "", "small_model_error"
+    return answer, check_answer(answer, rules, prompt)
@@ -0,0 +1,155 @@
+import io
+import httpx
+import pytest
+from anthropic import BadRequestError, NotFoundError, RateLimitError
+from PIL import Image
+from src.image_recognition_server import server
+from src.image_recognition_server.utils.store import ImageStore
+from src.image_recognition_server.vision.anthropic import (
+    FILES_API_BETA,
+    AnthropicVision,
+    _is_file_reference_error,
+)
+from src.image_recognition_server.vision.errors import FileReferenceError
+
+
+def api_error(error_class, status_code, message):
+    """Build an Anthropic API status error with the SDK's response body."""
+    request = httpx.Request("POST", "https://api.anthropic.com/v1/messages")
+    response = httpx.Response(status_code, request=request)
+    body = {"type": "error", "error": {"type": "error", "message": message}}
+    return error_class(message, response=response, body=body)
+
+
+class FakeEndpoint:
+    """Records keyword arguments and returns or raises a canned result."""
+
+    def __init__(self, result):
+        self.result = result
+        self.kwargs = []
+
+    def __call__(self, **kwargs):
+        self.kwargs.append(kwargs)
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+
+class FakeBlock:
+    def __init__(self, text):
+        self.type = "text"
+        self.text = text
+
+
+class FakeResponse:
+    def __init__(self, *texts):
+        self.content = [FakeBlock(text) for text in texts]
+        self.id = "file_abc"
+
+
+@pytest.fixture
+def vision(monkeypatch):
+    """AnthropicVision with the SDK's beta endpoints replaced by fakes."""
+    monkeypatch.setenv("ANTHROPIC_MODEL", "large")
+    vision = AnthropicVision(api_key="test-key")
+    vision.client.beta.messages.create = FakeEndpoint(FakeResponse("A red square"))
+    vision.client.beta.files.upload = FakeEndpoint(FakeResponse())
+    return vision
+
+
+def test_is_file_reference_error():
+    """Test that only errors naming the file count as file reference errors."""
+    assert _is_file_reference_error(
+        api_error(NotFoundError, 404, "File not found: file_abc")
+    )
+    assert _is_file_reference_error(
+        api_error(BadRequestError, 400, "image.source.file_id: invalid file ID")
+    )
+    # Unknown model names are also reported as 404
+    assert not _is_file_reference_error(
+        api_error(NotFoundError, 404, "model: claude-typo")
+    )
+    assert not _is_file_reference_error(
+        api_error(BadRequestError, 400, "max_tokens: must be positive")
+    )
+    assert not _is_file_reference_error(
+        api_error(RateLimitError, 429, "File uploads are rate limited")
+    )
+
+
+def test_describe_file(vision):
+    """Test that file references are sent with the Files API beta."""
+    result = vision.describe_image(
+        "", "What is this?", model="small", file_id="file_abc"
+    )
+    assert result == "A red square"
+
+    kwargs = vision.client.beta.messages.create.kwargs[0]
+    assert kwargs["model"] == "small"
+    assert kwargs["betas"] == [FILES_API_BETA]
+    image_block, text_block = kwargs["messages"][0]["content"]
+    assert image_block["source"] == {"type": "file", "file_id": "file_abc"}
+    assert text_block["text"] == "What is this?"
+
+
+def test_describe_missing_file(vision):
+    """Test that a missing file raises FileReferenceError."""
+    vision.client.beta.messages.create.result = api_error(
+        NotFoundError, 404, "File not found: file_abc"
+    )
+    with pytest.raises(FileReferenceError):
+        vision.describe_image("", "Describe", file_id="file_abc")
+
+
+def test_describe_unknown_model_with_file(vision):
+    """Test that an unknown model isn't mistaken for a missing file."""
+    vision.client.beta.messages.create.result = api_error(
+        NotFoundError, 404, "model: claude-typo"
+    )
+    with pytest.raises(Exception, match="API error") as excinfo:
+        vision.describe_image("", "Describe", model="claude-typo", file_id="file_abc")
+    assert not isinstance(excinfo.value, FileReferenceError)
+
+
+def test_upload_image(vision):
+    """Test uploading an image with the Files API beta."""
+    assert vision.upload_image(b"data", "image/png", "img_1.png") == "file_abc"
+    kwargs = vision.client.beta.files.upload.kwargs[0]
+    assert kwargs["file"] == ("img_1.png", b"data", "image/png")
+    assert kwargs["betas"] == [FILES_API_BETA]
+
+
+def test_upload_image_error(vision):
+    """Test that upload failures are reported as generic errors."""
+    vision.client.beta.files.upload.result = api_error(
+        BadRequestError, 400, "Unsupported file type"
+    )
+    with pytest.raises(Exception, match="API error"):
+        vision.upload_image(b"data", "image/png", "img_1.png")
+
+
+@pytest.mark.asyncio
+async def test_unknown_small_model_keeps_file_id(vision, monkeypatch, tmp_path):
+    """Test that a mistyped small model doesn't discard uploaded files."""
+    store = ImageStore(str(tmp_path / "store"))
+    monkeypatch.setattr(server, "_image_store", store)
+    monkeypatch.setattr(server, "get_vision_client", lambda: vision)
+    monkeypatch.setenv("ENABLE_OCR", "false")
+    monkeypatch.setenv("ENABLE_ROUTING", "true")
+    monkeypatch.setenv("ANTHROPIC_SMALL_MODEL", "claude-typo")
+    monkeypatch.setenv("PROVIDER_FILE_UPLOADS", "true")
+
+    def create(**kwargs):
+        if kwargs["model"] == "claude-typo":
+            raise api_error(NotFoundError, 404, "model: claude-typo")
+        return FakeResponse("A plain red square filling the whole image frame.")
+
+    vision.client.beta.messages.create = create
+    buffer = io.BytesIO()
+    Image.new('RGB', (16, 16), color='red').save(buffer, format='PNG')
+    image_id = store.put(buffer.getvalue())
+    for _ in range(3):
+        await server.describe_image(image_id=image_id)
+
+    assert len(vision.client.beta.files.upload.kwargs) == 1
+    assert store.get_file_id(image_id, "anthropic") == "file_abc"
@@ -0,0 +1,168 @@
+import asyncio
+import os
+import sqlite3
+import pytest
+from PIL import Image, ImageDraw
+from src.image_recognition_server.utils.index import ImageIndex, perceptual_hash
+
+
+class FakeDescriber:
+    """Returns a description per call and counts vision API calls."""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def __call__(self, image_data, prompt):
+        self.calls += 1
+        calls = self.calls
+        await asyncio.sleep(0.01)  # Let other files proceed, like a network call
+        return f"A red invoice scan number {calls}"
+
+
+@pytest.fixture
+def image_dir(tmp_path):
+    """Create a directory with two distinct test images."""
+    directory = tmp_path / "images"
+    directory.mkdir()
+    Image.new('RGB', (32, 32), color='red').save(directory / "a.png")
+    img = Image.new('RGB', (32, 32), color='white')
+    ImageDraw.Draw(img).rectangle((0, 0, 15, 31), fill='black')
+    img.save(directory / "b.png")
+    (directory / "notes.txt").write_text("not an image")
+    return directory
+
+
+@pytest.fixture
+def index(tmp_path):
+    """Open an index in a temporary database."""
+    index = ImageIndex(str(tmp_path / "index.db"))
+    yield index
+    index.close()
+
+
+def test_perceptual_hash():
+    """Test that dHash is stable and distinguishes different images."""
+    flat = Image.new('RGB', (64, 64), color='red')
+    split = Image.new('RGB', (64, 64), color='white')
+    ImageDraw.Draw(split).rectangle((32, 0, 63, 63), fill='black')
+    assert perceptual_hash(flat) == perceptual_hash(flat.resize((128, 128)))
+    assert perceptual_hash(flat) != perceptual_hash(split)
+    assert len(perceptual_hash(flat)) == 16
+
+
+@pytest.mark.asyncio
+async def test_incremental_refresh(index, image_dir):
+    """Test that only new or changed files are sent to the vision API."""
+    describe = FakeDescriber()
+
+    stats = await index.refresh(str(image_dir), describe)
+    assert stats["indexed"] == 2
+    assert describe.calls == 2
+
+    stats = await index.refresh(str(image_dir), describe)
+    assert stats["unchanged"] == 2
+    assert describe.calls == 2
+
+    # A touched file with identical content reuses the stored description
+    os.utime(image_dir / "a.png", (1, 1))
+    stats = await index.refresh(str(image_dir), describe)
+    assert stats["reused"] == 1
+    assert describe.calls == 2
+
+    # Changed content and deleted files are picked up
+    Image.new('RGB', (32, 32), color='green').save(image_dir / "a.png")
+    (image_dir / "b.png").unlink()
+    stats = await index.refresh(str(image_dir), describe)
+    assert stats["indexed"] == 1
+    assert stats["removed"] == 1
+    assert describe.calls == 3
+
+
+@pytest.mark.asyncio
+async def test_search(index, image_dir):
+    """Test full-text search over indexed descriptions."""
+    await index.refresh(str(image_dir), FakeDescriber())
+
+    results = index.search("invoice")
+    assert len(results) == 2
+    assert all(r["path"].startswith(str(image_dir)) for r in results)
+
+    assert index.search("nonexistent") == []
+    # FTS5 syntax characters in the query are treated as plain text
+    assert len(index.search('invoice AND "')) == 0
+    assert index.search("") == []
+
+
+@pytest.mark.asyncio
+async def test_search_stemming(index, image_dir):
+    """Test that search terms match other word forms."""
+    await index.refresh(str(image_dir), FakeDescriber())
+    assert len(index.search("invoices")) == 2
+    assert len(index.search("scanned")) == 2
+
+
+def test_migrates_old_fts_table(tmp_path):
+    """Test that indexes without stemming are rebuilt from stored rows."""
+    db_path = str(tmp_path / "old.db")
+    conn = sqlite3.connect(db_path)
+    conn.executescript(
+        "CREATE TABLE images (path TEXT PRIMARY KEY, size INTEGER NOT NULL, "
+        "mtime REAL NOT NULL, content_hash TEXT NOT NULL, phash TEXT, "
+        "description TEXT, ocr_text TEXT, indexed_at REAL NOT NULL);"
+        "CREATE VIRTUAL TABLE images_fts USING fts5 "
+        "(path UNINDEXED, description, ocr_text);"
+        "INSERT INTO images VALUES ('/x.png', 1, 1, 'h', NULL, 'invoices', NULL, 1);"
+        "INSERT INTO images_fts VALUES ('/x.png', 'invoices', '');"
+    )
+    conn.close()
+
+    index = ImageIndex(db_path)
+    try:
+        assert [r["path"] for r in index.search("invoice")] == ["/x.png"]
+    finally:
+        index.close()
+
+
+@pytest.mark.asyncio
+async def test_missing_directory(index, tmp_path):
+    """Test that indexing a missing directory raises FileNotFoundError."""
+    with pytest.raises(FileNotFoundError):
+        await index.refresh(str(tmp_path / "missing"), FakeDescriber())
+
+
+@pytest.mark.asyncio
+async def test_duplicates_in_one_crawl(index, image_dir):
+    """Test that identical files in one crawl call the vision API once."""
+    (image_dir / "copy.png").write_bytes((image_dir / "a.png").read_bytes())
+    describe = FakeDescriber()
+
+    stats = await index.refresh(str(image_dir), describe)
+    assert stats["indexed"] == 2
+    assert stats["reused"] == 1
+    assert describe.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_prompt_change_reindexes(index, image_dir):
+    """Test that a different prompt reprocesses files instead of reusing."""
+    describe = FakeDescriber()
+    await index.refresh(str(image_dir), describe)
+
+    stats = await index.refresh(str(image_dir), describe, prompt="List all text")
+    assert stats["indexed"] == 2
+    assert stats["unchanged"] == 0
+    assert describe.calls == 4
+
+
+@pytest.mark.asyncio
+async def test_search_directory_is_literal(index, tmp_path):
+    """Test that _ and % in the directory filter are not wildcards."""
+    for name in ("tmpx", "tm_x"):
+        directory = tmp_path / name
+        directory.mkdir()
+        Image.new('RGB', (8, 8), color='red').save(directory / "a.png")
+        await index.refresh(str(directory), FakeDescriber())
+
+    results = index.search("invoice", directory=str(tmp_path / "tm_x"))
+    assert [r["path"] for r in results] == [str(tmp_path / "tm_x" / "a.png")]
+    assert index.search("invoice", directory=str(tmp_path / "tm%")) == []
@@ -1,7 +1,16 @@
+import io
 import os
 import pytest
 from PIL import Image, ImageDraw, ImageFont
-from src.image_recognition_server.utils.ocr import extract_text_from_image, OCRError
+from src.image_recognition_server.utils import ocr
+from src.image_recognition_server.utils.ocr import (
+    extract_text_from_image,
+    extract_ocr_data,
+    extract_ocr_data_cached,
+    extract_text_cached,
+    ocr_cache,
+    OCRError,
+)
 
 @pytest.fixture
 def text_image():
@@ -91,3 +100,137 @@ def test_ocr_required_flag(monkeypatch):
     # Test with ocr_required=True
     result = extract_text_from_image(img, ocr_required=True)
     assert result is None  # Should still be None since empty string is converted to None
+
+
+MOCK_OCR_DATA = {
+    "text": ["", "Hello", "World", "faint", ""],
+    "conf": [-1, 96.5, 91.0, 12.0, -1],
+    "left": [0, 10, 70, 10, 0],
+    "top": [0, 20, 22, 60, 0],
+    "width": [800, 50, 55, 40, 0],
+    "height": [200, 18, 16, 15, 0],
+    "page_num": [1, 1, 1, 1, 1],
+    "block_num": [0, 1, 1, 1, 1],
+    "par_num": [0, 1, 1, 1, 1],
+    "line_num": [0, 1, 1, 2, 2],
+}
+
+
+@pytest.fixture
+def image_bytes():
+    """Encode a blank test image as PNG bytes."""
+    buffer = io.BytesIO()
+    Image.new('RGB', (100, 100), color='white').save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+@pytest.fixture(autouse=True)
+def clear_ocr_cache():
+    """Start every test with an empty OCR cache."""
+    ocr_cache.clear()
+    yield
+    ocr_cache.clear()
+
+
+def test_layout_extraction(monkeypatch):
+    """Test words and lines with boxes and confidences from image_to_data."""
+    calls = []
+
+    def mock_image_to_data(*args, **kwargs):
+        calls.append(kwargs)
+        return MOCK_OCR_DATA
+
+    monkeypatch.setattr("pytesseract.image_to_data", mock_image_to_data)
+
+    img = Image.new('RGB', (100, 100), color='white')
+    result = extract_ocr_data(img, lang="eng", psm=6)
+
+    assert calls[0]["lang"] == "eng"
+    assert calls[0]["config"] == "--psm 6"
+    assert [w["text"] for w in result["words"]] == ["Hello", "World", "faint"]
+    assert len(result["lines"]) == 2
+    first_line = result["lines"][0]
+    assert first_line["text"] == "Hello World"
+    assert (first_line["left"], first_line["top"]) == (10, 20)
+    assert (first_line["width"], first_line["height"]) == (115, 18)
+    assert first_line["confidence"] == 93.75
+    assert result["text"] == "Hello World\nfaint"
+
+
+def test_layout_min_confidence(monkeypatch):
+    """Test that low-confidence words are filtered out."""
+    monkeypatch.setattr("pytesseract.image_to_data", lambda *a, **k: MOCK_OCR_DATA)
+
+    img = Image.new('RGB', (100, 100), color='white')
+    result = extract_ocr_data(img, min_confidence=50)
+    assert result["text"] == "Hello World"
+    assert len(result["lines"]) == 1
+
+    assert extract_ocr_data(img, min_confidence=99) is None
+
+
+def test_layout_cache_reuses_results(monkeypatch, image_bytes):
+    """Test that repeated images never re-run Tesseract."""
+    calls = []
+
+    def mock_image_to_data(*args, **kwargs):
+        calls.append(kwargs)
+        return MOCK_OCR_DATA
+
+    monkeypatch.setattr("pytesseract.image_to_data", mock_image_to_data)
+
+    first = extract_ocr_data_cached(image_bytes)
+    filtered = extract_ocr_data_cached(image_bytes, min_confidence=50)
+    assert len(calls) == 1
+    assert len(first["words"]) == 3
+    assert len(filtered["words"]) == 2
+
+    # A different language is a different cache entry
+    extract_ocr_data_cached(image_bytes, lang="deu")
+    assert len(calls) == 2
+
+
+def test_text_cache_reuses_results(monkeypatch, image_bytes):
+    """Test that plain text OCR is cached per image content."""
+    calls = []
+
+    def mock_image_to_string(*args, **kwargs):
+        calls.append(kwargs)
+        return "Hello World"
+
+    monkeypatch.setattr("pytesseract.image_to_string", mock_image_to_string)
+
+    assert extract_text_cached(image_bytes) == "Hello World"
+    assert extract_text_cached(image_bytes) == "Hello World"
+    assert len(calls) == 1
+    assert (ocr_cache.hits, ocr_cache.misses) == (1, 1)
+
+
+def test_cache_skips_failures(monkeypatch, image_bytes):
+    """Test that OCR failures are not cached."""
+    def mock_image_to_string(*args, **kwargs):
+        raise Exception("tesseract is not installed or it's not in your PATH")
+
+    monkeypatch.setattr("pytesseract.image_to_string", mock_image_to_string)
+
+    assert extract_text_cached(image_bytes) is None
+    with pytest.raises(OCRError):
+        extract_text_cached(image_bytes, ocr_required=True)
+    assert len(ocr_cache) == 0
+
+
+def test_cache_undecodable_bytes():
+    """Test that bytes that aren't an image are treated as an OCR failure."""
+    assert extract_text_cached(b"not an image") is None
+    assert extract_ocr_data_cached(b"not an image") is None
+    with pytest.raises(OCRError):
+        extract_text_cached(b"not an image", ocr_required=True)
+    assert len(ocr_cache) == 0
+
+
+def test_invalid_cache_size(monkeypatch):
+    """Test that an invalid OCR_CACHE_SIZE falls back to the default."""
+    monkeypatch.setenv("OCR_CACHE_SIZE", "lots")
+    assert ocr._cache_size_from_env() == 128
+    monkeypatch.setenv("OCR_CACHE_SIZE", "16")
+    assert ocr._cache_size_from_env() == 16
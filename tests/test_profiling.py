@@ -0,0 +1,129 @@
+import asyncio
+import json
+import time
+import pytest
+from src.image_recognition_server.utils import profiling
+from src.image_recognition_server.utils.profiling import span, trace_request
+
+
+@pytest.fixture(autouse=True)
+def profiling_env(monkeypatch, tmp_path):
+    """Enable profiling with output in a temporary directory."""
+    monkeypatch.setenv("ENABLE_PROFILING", "true")
+    monkeypatch.setenv("PROFILING_TRACE_FILE", str(tmp_path / "traces.jsonl"))
+    monkeypatch.setenv("PROFILING_DIR", str(tmp_path / "profiles"))
+    monkeypatch.setenv("PROFILING_SAMPLE_RATE", "0")
+    monkeypatch.delenv("PROFILING_OTLP_ENDPOINT", raising=False)
+    profiling._slowest_profiles.clear()
+    yield
+    profiling._slowest_profiles.clear()
+    profiling._release_profiler()
+
+
+def test_span_without_trace():
+    """Test that spans are no-ops outside a traced request."""
+    with span("stage") as record:
+        assert record is None
+
+
+def test_timings_disabled(monkeypatch):
+    """Test that nothing is traced when profiling is off and not forced."""
+    monkeypatch.setenv("ENABLE_PROFILING", "false")
+    with trace_request("tool") as trace:
+        assert trace is None
+    with trace_request("tool", force=True) as trace:
+        with span("stage"):
+            pass
+    assert "stage" in trace.timings()
+
+
+def test_timings_and_otlp_export(tmp_path):
+    """Test per-stage timings and the OTLP/JSON trace file."""
+    with trace_request("describe_image") as trace:
+        with span("provider", provider="openai"):
+            time.sleep(0.01)
+        with span("ocr"):
+            pass
+        with span("ocr"):
+            pass
+
+    timings = trace.timings()
+    assert list(timings) == ["provider", "ocr", "total"]
+    assert timings["provider"] >= 10
+    assert timings["total"] >= timings["provider"]
+
+    lines = (tmp_path / "traces.jsonl").read_text().splitlines()
+    assert len(lines) == 1
+    spans = json.loads(lines[0])["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    root = next(s for s in spans if s["name"] == "describe_image")
+    provider = next(s for s in spans if s["name"] == "provider")
+    assert "parentSpanId" not in root
+    assert provider["parentSpanId"] == root["spanId"]
+    assert provider["traceId"] == root["traceId"]
+    assert {"key": "provider", "value": {"stringValue": "openai"}} in provider[
+        "attributes"
+    ]
+
+
+def test_nested_requests_share_trace():
+    """Test that a nested tool call becomes a span of the outer trace."""
+    with trace_request("describe_image_from_file") as outer:
+        with trace_request("describe_image") as inner:
+            assert inner is outer
+    assert "describe_image" in outer.timings()
+
+
+def test_keeps_slowest_profiles(monkeypatch, tmp_path):
+    """Test that only the N slowest sampled requests keep their profiles."""
+    monkeypatch.setenv("PROFILING_SAMPLE_RATE", "1")
+    monkeypatch.setenv("PROFILING_TOP_N", "1")
+
+    for delay in (0.02, 0.001):
+        with trace_request("tool"):
+            time.sleep(delay)
+
+    profiles = list((tmp_path / "profiles").glob("*.prof"))
+    assert len(profiles) == 1
+    assert int(profiles[0].name.split("-")[1].rstrip("ms")) >= 20
+
+    with trace_request("tool"):
+        time.sleep(0.05)
+    profiles = list((tmp_path / "profiles").glob("*.prof"))
+    assert len(profiles) == 1
+    assert int(profiles[0].name.split("-")[1].rstrip("ms")) >= 50
+
+
+def test_invalid_settings_fall_back(monkeypatch, tmp_path):
+    """Test that malformed profiling settings don't break requests."""
+    monkeypatch.setenv("PROFILING_SAMPLE_RATE", "abc")
+    with trace_request("tool") as trace:
+        pass
+    assert trace.timings()["total"] >= 0
+
+    monkeypatch.setenv("PROFILING_SAMPLE_RATE", "1")
+    monkeypatch.setenv("PROFILING_TOP_N", "abc")
+    with trace_request("tool"):
+        pass
+    assert len(list((tmp_path / "profiles").glob("*.prof"))) == 1
+
+
+@pytest.mark.asyncio
+async def test_overlapping_sampled_requests(monkeypatch, tmp_path):
+    """Test that only one request is profiled while requests overlap."""
+    monkeypatch.setenv("PROFILING_SAMPLE_RATE", "1")
+    monkeypatch.setenv("PROFILING_TOP_N", "5")
+
+    async def request(name, delay):
+        with trace_request(name):
+            await asyncio.sleep(delay)
+
+    await asyncio.gather(request("a", 0.03), request("b", 0.01))
+
+    profiles = list((tmp_path / "profiles").glob("*.prof"))
+    assert [p.name.split("-")[0] for p in profiles] == ["a"]
+    assert profiling._profiler_active is False
+
+    # The next request can be profiled again
+    with trace_request("c"):
+        pass
+    assert len(list((tmp_path / "profiles").glob("c-*.prof"))) == 1
@@ -0,0 +1,139 @@
+import base64
+import io
+import pytest
+from PIL import Image
+from src.image_recognition_server.vision.routing import (
+    check_answer,
+    compute_image_features,
+    describe_with_routing,
+    get_routing_rules,
+)
+
+LONG_ANSWER = "A simple blue square icon with rounded corners on a white background."
+
+
+class FakeVision:
+    """Records the model used for each call and returns canned answers."""
+
+    provider = "openai"
+
+    def __init__(self, answers):
+        self.answers = answers
+        self.models = []
+
+    async def describe_image(self, image, prompt, model=None):
+        self.models.append(model)
+        return self.answers.get(model, LONG_ANSWER)
+
+
+def encode_image(img):
+    """Encode a PIL image as base64 PNG."""
+    buffer = io.BytesIO()
+    img.save(buffer, format='PNG')
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+@pytest.fixture
+def icon_image():
+    """Create a small, low-entropy test image."""
+    return encode_image(Image.new('RGB', (64, 64), color='blue'))
+
+
+@pytest.fixture(autouse=True)
+def routing_env(monkeypatch):
+    """Configure a small model for the fake provider."""
+    monkeypatch.setenv("OPENAI_SMALL_MODEL", "small")
+    monkeypatch.delenv("ROUTING_MAX_PIXELS", raising=False)
+    monkeypatch.delenv("OPENAI_ROUTING_MAX_PIXELS", raising=False)
+    monkeypatch.delenv("ROUTING_USE_OCR", raising=False)
+    monkeypatch.delenv("ENABLE_OCR", raising=False)
+
+
+def test_image_features(icon_image):
+    """Test local feature extraction on a blank image."""
+    features = compute_image_features(base64.b64decode(icon_image))
+    assert features["pixels"] == 64 * 64
+    assert features["entropy"] == 0
+    assert features["text_density"] == 0
+
+
+def test_large_image_skips_features(icon_image):
+    """Test that entropy and OCR density are skipped above max_pixels."""
+    features = compute_image_features(
+        base64.b64decode(icon_image), use_ocr=True, max_pixels=100
+    )
+    assert features["pixels"] == 64 * 64
+    assert features["entropy"] is None
+    assert features["text_density"] is None
+
+
+def test_per_provider_rules(monkeypatch):
+    """Test that provider-specific rules override the global ones."""
+    monkeypatch.setenv("ROUTING_MAX_PIXELS", "1000")
+    monkeypatch.setenv("OPENAI_ROUTING_MAX_PIXELS", "2000")
+    assert get_routing_rules("openai")["max_pixels"] == 2000
+    assert get_routing_rules("anthropic")["max_pixels"] == 1000
+    assert get_routing_rules("anthropic")["small_model"] is None
+
+
+def test_check_answer():
+    """Test escalation heuristics on small-model answers."""
+    rules = get_routing_rules("openai")
+    assert check_answer(LONG_ANSWER, rules) is None
+    assert check_answer("An icon.", rules) == "short_answer"
+    assert check_answer(
+        "I'm not sure what this shows, the image is very blurry overall.", rules
+    ) == "uncertain_answer"
+
+
+def test_check_answer_closed_question():
+    """Test that short answers to direct questions are not escalated."""
+    rules = get_routing_rules("openai")
+    assert check_answer("Red.", rules, "What color is it?") is None
+    assert check_answer("", rules, "What color is it?") == "short_answer"
+    assert check_answer("Red.", rules, "Describe this image.") == "short_answer"
+
+
+@pytest.mark.asyncio
+async def test_short_answer_to_question_accepted(icon_image):
+    """Test that a short small-model answer to a question isn't escalated."""
+    client = FakeVision({"small": "Blue."})
+    result = await describe_with_routing(client, icon_image, "What color is it?")
+    assert result == "Blue."
+    assert client.models == ["small"]
+
+
+@pytest.mark.asyncio
+async def test_small_model_accepted(icon_image):
+    """Test that a confident small-model answer is returned directly."""
+    client = FakeVision({})
+    result = await describe_with_routing(client, icon_image, "Describe")
+    assert result == LONG_ANSWER
+    assert client.models == ["small"]
+
+
+@pytest.mark.asyncio
+async def test_escalates_low_confidence_answer(icon_image):
+    """Test that a weak small-model answer is escalated to the large model."""
+    client = FakeVision({"small": "Unclear."})
+    result = await describe_with_routing(client, icon_image, "Describe")
+    assert result == LONG_ANSWER
+    assert client.models == ["small", None]
+
+
+@pytest.mark.asyncio
+async def test_large_image_skips_small_model(monkeypatch, icon_image):
+    """Test that heuristics send large images straight to the large model."""
+    monkeypatch.setenv("ROUTING_MAX_PIXELS", "100")
+    client = FakeVision({})
+    await describe_with_routing(client, icon_image, "Describe")
+    assert client.models == [None]
+
+
+@pytest.mark.asyncio
+async def test_no_small_model_configured(monkeypatch, icon_image):
+    """Test that routing is a no-op without a small model."""
+    monkeypatch.delenv("OPENAI_SMALL_MODEL")
+    client = FakeVision({})
+    await describe_with_routing(client, icon_image, "Describe")
+    assert client.models == [None]
@@ -0,0 +1,154 @@
+import base64
+import io
+import pytest
+from PIL import Image
+from src.image_recognition_server import server
+from src.image_recognition_server.utils.store import ImageStore
+from src.image_recognition_server.vision.errors import FileReferenceError
+
+
+def encode_png(color='red', format='PNG'):
+    """Encode a small test image as PNG bytes."""
+    buffer = io.BytesIO()
+    Image.new('RGB', (16, 16), color=color).save(buffer, format=format)
+    return buffer.getvalue()
+
+
+class FakeVision:
+    """Sync vision client that supports file uploads and records calls."""
+
+    provider = "anthropic"
+
+    def __init__(self, file_error=None):
+        self.uploads = 0
+        self.calls = []
+        self.mime_types = []
+        self.file_error = file_error
+
+    def upload_image(self, data, mime_type, filename):
+        self.uploads += 1
+        return f"file_{self.uploads}"
+
+    def describe_image(self, image, prompt, file_id=None, mime_type="image/png"):
+        self.calls.append(file_id)
+        self.mime_types.append(mime_type)
+        if file_id and self.file_error:
+            raise self.file_error
+        return "A red square"
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    """Point the server at a temporary image store."""
+    store = ImageStore(str(tmp_path / "store"))
+    monkeypatch.setattr(server, "_image_store", store)
+    monkeypatch.setenv("ENABLE_OCR", "false")
+    monkeypatch.setenv("ENABLE_ROUTING", "false")
+    return store
+
+
+def test_put_is_content_addressed(store):
+    """Test that identical content is stored once under the same ID."""
+    data = encode_png()
+    image_id = store.put(data)
+    assert image_id.startswith("img_")
+    assert store.put(data) == image_id
+    assert store.put(encode_png('blue')) != image_id
+    assert store.get(image_id) == data
+    assert store.get_meta(image_id)["mime_type"] == "image/png"
+
+
+def test_invalid_ids_and_data(store):
+    """Test rejection of unknown IDs, path-like IDs and non-image data."""
+    with pytest.raises(ValueError):
+        store.get("img_0000000000000000")
+    with pytest.raises(ValueError):
+        store.get("../etc/passwd")
+    with pytest.raises(ValueError):
+        store.put(b"not an image")
+
+
+def test_unsupported_format_rejected(store):
+    """Test that formats the providers can't accept aren't registered."""
+    with pytest.raises(ValueError, match="Unsupported image format: BMP"):
+        store.put(encode_png(format='BMP'))
+    assert list(store.root.iterdir()) == []
+
+
+def test_file_ids(store):
+    """Test recording and forgetting provider file IDs."""
+    image_id = store.put(encode_png())
+    assert store.get_file_id(image_id, "anthropic") is None
+    store.set_file_id(image_id, "anthropic", "file_1")
+    assert store.get_file_id(image_id, "anthropic") == "file_1"
+    store.set_file_id(image_id, "anthropic", None)
+    assert store.get_file_id(image_id, "anthropic") is None
+
+
+@pytest.mark.asyncio
+async def test_describe_registered_image(store, monkeypatch, tmp_path):
+    """Test registering by file and describing by ID with one upload."""
+    monkeypatch.setenv("PROVIDER_FILE_UPLOADS", "true")
+    client = FakeVision()
+    monkeypatch.setattr(server, "get_vision_client", lambda: client)
+
+    path = tmp_path / "red.png"
+    path.write_bytes(encode_png())
+    image_id = await server.register_image(filepath=str(path))
+    assert image_id == await server.register_image(
+        image=base64.b64encode(encode_png()).decode()
+    )
+
+    for prompt in ("What color is it?", "What shape is it?"):
+        assert await server.describe_image(image_id=image_id, prompt=prompt)
+    assert client.uploads == 1
+    assert client.calls == ["file_1", "file_1"]
+
+
+@pytest.mark.asyncio
+async def test_stale_file_id_falls_back_inline(store, monkeypatch):
+    """Test that a failing file reference is forgotten and sent inline."""
+    monkeypatch.setenv("PROVIDER_FILE_UPLOADS", "true")
+    client = FakeVision(file_error=FileReferenceError("File not found"))
+    monkeypatch.setattr(server, "get_vision_client", lambda: client)
+
+    image_id = store.put(encode_png())
+    assert await server.describe_image(image_id=image_id) == "A red square"
+    assert client.calls == ["file_1", None]
+    assert store.get_file_id(image_id, "anthropic") is None
+
+
+@pytest.mark.asyncio
+async def test_transient_error_keeps_file_id(store, monkeypatch):
+    """Test that errors other than a missing file keep the uploaded file."""
+    monkeypatch.setenv("PROVIDER_FILE_UPLOADS", "true")
+    client = FakeVision(file_error=Exception("Rate limit exceeded"))
+    monkeypatch.setattr(server, "get_vision_client", lambda: client)
+
+    image_id = store.put(encode_png())
+    with pytest.raises(Exception, match="Rate limit"):
+        await server.describe_image(image_id=image_id)
+    assert store.get_file_id(image_id, "anthropic") == "file_1"
+    assert client.uploads == 1
+
+
+@pytest.mark.asyncio
+async def test_registered_image_mime_type(store, monkeypatch):
+    """Test that images sent inline by ID use their stored MIME type."""
+    monkeypatch.delenv("PROVIDER_FILE_UPLOADS", raising=False)
+    client = FakeVision()
+    monkeypatch.setattr(server, "get_vision_client", lambda: client)
+
+    image_id = store.put(encode_png(format='JPEG'))
+    await server.describe_image(image_id=image_id)
+    assert client.calls == [None]
+    assert client.mime_types == ["image/jpeg"]
+
+
+@pytest.mark.asyncio
+async def test_describe_requires_image(store):
+    """Test that describe_image needs either image data or an ID."""
+    with pytest.raises(ValueError):
+        await server.describe_image()
+    with pytest.raises(ValueError):
+        await server.describe_image(image_id="img_0000000000000000")